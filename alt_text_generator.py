@@ -5,20 +5,54 @@ Generates alt text for images using OpenAI's Vision API
 """
 
 import os
+import sys
 import base64
-import requests
-from typing import List, Dict, Optional
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple, Union
 from urllib.parse import urlparse
 import json
-from dataclasses import dataclass
-from openai import OpenAI
+from dataclasses import dataclass, field, replace
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
 import logging
-from dotenv import load_dotenv
 import time
+import re
+import heapq
+import hashlib
+import queue
+import itertools
+import threading
+from image_urls import canonical_image_url, parse_srcset, choose_analysis_candidate
+from prefilter import prefilter_images, GENERATE, DECORATIVE, PENDING
+from prompts import PromptTemplate, get_template
+from tracing import configure_tracing, profiled, span
+from validation import (
+    DuplicateTracker, DUPLICATE, clean_alt_text, validate_alt_text, correction_hint
+)
+from vision_backends import (
+    VisionBackend, OpenAIBackend, DEFAULT_OPENAI_MODEL,
+    backend_from_env, backend_requires_openai_key, is_rate_limit_error
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# How long generated alt text is reused from a cache
+CACHE_TTL_SECONDS = 86400
+
+
+def get_cache_key(image_url: str, prompt_version: str) -> str:
+    """
+    Generate cache key for an image URL
+    
+    The key is shared by all size variants of the asset and includes the
+    prompt template version, so changing the prompt invalidates old entries.
+    """
+    return hashlib.md5(f"{prompt_version}|{canonical_image_url(image_url)}".encode()).hexdigest()
+
+
+# Priority lanes for vision API calls (lower value is served first)
+PRIORITY_INTERACTIVE = 0  # Single-image requests from the Framer plugin
+PRIORITY_BULK = 1  # Batch endpoints and CLI sweeps
+
 
 @dataclass
 class ImageInfo:
@@ -27,158 +61,615 @@ class ImageInfo:
     current_alt: Optional[str] = None
     selector: Optional[str] = None
     element_id: Optional[str] = None
+    asset_id: Optional[str] = None  # Canonical URL shared by all size variants
+    analysis_url: Optional[str] = None  # Smallest adequate variant for the vision model
+    page: Optional[str] = None  # Page path the image was found on
+    role: Optional[str] = None
+    aria_hidden: bool = False
+    width: Optional[int] = None  # Width/height attributes from the HTML, if present
+    height: Optional[int] = None
+    decorative: bool = False  # Pre-filtered as decorative (alt="")
+    context: Dict[str, str] = field(default_factory=dict)  # Heading, caption, link text near the image
+
+
+class PrioritySlots:
+    """
+    Slot bookkeeping shared by PriorityRateLimiter and AsyncPriorityRateLimiter
+
+    Slots are spaced at least ``min_interval`` seconds apart. Waiting callers
+    hold (priority, sequence) tickets in a heap and are served lowest priority
+    value first (FIFO within a lane). Subclasses only add the waiting, under
+    their own lock or condition.
+    """
+
+    def __init__(self, min_interval: float = 1.0):
+        """
+        Args:
+            min_interval: Minimum delay in seconds between two API calls
+        """
+        self.min_interval = min_interval
+        self._waiters = []  # Heap of (priority, sequence) tickets
+        self._sequence = itertools.count()
+        self._next_slot = 0.0
+
+    def _enqueue(self, priority: int) -> Tuple[int, int]:
+        """Queue a caller and return its ticket"""
+        ticket = (priority, next(self._sequence))
+        heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _take_slot(self, ticket: Tuple[int, int], now: float) -> Optional[float]:
+        """
+        Give the next slot to a ticket if it is first in line and the slot is free
+
+        Returns:
+            0.0 when the slot was taken, the seconds until the slot is free when
+            the ticket is first in line, or None while other callers are ahead
+        """
+        if self._waiters[0] != ticket:
+            return None
+        wait = self._next_slot - now
+        if wait > 0:
+            return wait
+        heapq.heappop(self._waiters)
+        self._next_slot = now + self.min_interval
+        return 0.0
+
+    def _withdraw(self, ticket: Tuple[int, int]):
+        """Remove the ticket of a caller that gave up waiting"""
+        if ticket in self._waiters:
+            self._waiters.remove(ticket)
+            heapq.heapify(self._waiters)
+
+    def _count_pending(self, priority: Optional[int] = None) -> int:
+        if priority is None:
+            return len(self._waiters)
+        return sum(1 for lane, _ in self._waiters if lane == priority)
+
+
+class PriorityRateLimiter(PrioritySlots):
+    """
+    Thread-safe rate limiter that hands out API call slots by priority
+
+    Slots are spaced at least ``min_interval`` seconds apart. Waiting callers
+    are served lowest priority value first (FIFO within a lane), so an
+    interactive request always takes the next free slot ahead of any queued
+    bulk work instead of waiting behind it.
+    """
+
+    def __init__(self, min_interval: float = 1.0):
+        """
+        Args:
+            min_interval: Minimum delay in seconds between two API calls
+        """
+        super().__init__(min_interval)
+        self._cond = threading.Condition()
+
+    def acquire(self, priority: int = PRIORITY_BULK) -> float:
+        """
+        Block until the caller may make an API call
+
+        Args:
+            priority: Lane of the caller (PRIORITY_INTERACTIVE or PRIORITY_BULK)
+
+        Returns:
+            Seconds spent waiting for the slot
+        """
+        started = time.time()
+
+        with self._cond:
+            ticket = self._enqueue(priority)
+            try:
+                while True:
+                    now = time.time()
+                    wait = self._take_slot(ticket, now)
+                    if wait == 0:
+                        self._cond.notify_all()
+                        return now - started
+                    # Wakes early if a higher priority caller arrives; None waits for a notify
+                    self._cond.wait(wait)
+            except BaseException:
+                self._withdraw(ticket)
+                self._cond.notify_all()
+                raise
+
+    def pending(self, priority: Optional[int] = None) -> int:
+        """Number of callers waiting, optionally restricted to one lane"""
+        with self._cond:
+            return self._count_pending(priority)
+
+
+class GenerationSteps:
+    """
+    Prompt, retry and validation steps shared by AltTextGenerator and AsyncAltTextGenerator
+
+    The generators differ only in how they wait and call the backend; what
+    is sent, when to retry and which answers are accepted is decided here.
+    """
+
+    prompt_template: PromptTemplate
+    max_regenerations: int
 
+    def _prompt(self, context: Union[str, Dict[str, str]], correction: str = "") -> Tuple[str, str]:
+        """
+        Build the (instructions, context text) pair for one call
+
+        The instructions are precompiled; only the context is rendered per call.
+        """
+        if correction:
+            context = dict(context) if isinstance(context, dict) else ({'note': context} if context else {})
+            context['correction'] = correction
+        return self.prompt_template.instructions, self.prompt_template.render_context(context)
+
+    @staticmethod
+    def _retry_delay(error: Exception, image_url: str, attempt: int, retry_count: int) -> Optional[float]:
+        """
+        Decide whether a failed backend call is retried
+
+        Returns:
+            Seconds to back off before the next attempt, or None to give up
+        """
+        if not is_rate_limit_error(error):
+            logger.error(f"Error generating alt text for {image_url}: {str(error)}")
+            return None
+        if attempt >= retry_count - 1:
+            logger.error(f"Rate limit exceeded after {retry_count} attempts for {image_url}")
+            return None
+        backoff_time = 2 ** attempt + 1  # Exponential backoff: 2, 3, 5 seconds
+        logger.warning(f"Rate limit hit for {image_url}. Retrying in {backoff_time} seconds... (attempt {attempt + 1}/{retry_count})")
+        return backoff_time
 
-class AltTextGenerator:
-    """Generates alt text for images using OpenAI Vision API"""
+    def _review_alt_text(self, image_url: str, alt_text: Optional[str], attempt: int,
+                         duplicates: Optional[DuplicateTracker] = None,
+                         asset_id: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Clean and validate one generated answer
+
+        Args:
+            image_url: URL of the image
+            alt_text: Answer of the backend, or None if the backend call failed
+            attempt: Number of earlier rejected answers for this image
+            duplicates: Tracker of alt text already used for other images
+            asset_id: Asset of the image (defaults to its canonical URL)
+
+        Returns:
+            (alt text, "") when the answer is accepted, ("", correction hint
+            for the next attempt) when it is rejected, or ("", "") when the
+            backend failed and regenerating would only fail again
+        """
+        if alt_text is None:
+            return "", ""
+        asset_id = asset_id or canonical_image_url(image_url)
+        alt_text = clean_alt_text(alt_text)
+        reason = validate_alt_text(alt_text)
+        if not reason and duplicates and duplicates.is_duplicate(alt_text, asset_id):
+            # Identical images can legitimately share alt text, so a duplicate
+            # is only regenerated while attempts remain
+            if attempt < self.max_regenerations:
+                reason = DUPLICATE
+        if not reason:
+            if duplicates:
+                duplicates.add(alt_text, asset_id)
+            return alt_text, ""
+        logger.warning(f"Rejected alt text for {image_url} ({reason}): {alt_text!r}")
+        return "", correction_hint(reason, alt_text)
+
+
+class AltTextGenerator(GenerationSteps):
+    """Generates alt text for images using a vision backend (OpenAI Vision API by default)"""
     
-    def __init__(self, openai_api_key: str, rate_limit_delay: float = 1.0):
+    def __init__(self, openai_api_key: Optional[str] = None, rate_limit_delay: float = 1.0,
+                 rate_limiter: Optional[PriorityRateLimiter] = None,
+                 backend: Optional[VisionBackend] = None, model: str = DEFAULT_OPENAI_MODEL,
+                 prompt_template: Optional[PromptTemplate] = None, max_regenerations: int = 2):
         """
         Initialize the generator with OpenAI API key
         
         Args:
             openai_api_key: OpenAI API key for Vision API access
             rate_limit_delay: Delay in seconds between API calls to avoid rate limits
+            rate_limiter: Shared limiter to use instead of a private one, so that
+                several generators draw from the same rate limit budget
+            backend: Vision backend to use instead of the OpenAI API
+            model: OpenAI model used when no backend is given
+            prompt_template: Prompt template (defaults to PROMPT_TEMPLATE or the built-in one)
+            max_regenerations: How often rejected alt text is regenerated with an
+                adjusted prompt before the image counts as failed; ignored for
+                backends that do not follow instructions, such as local captioning
         """
-        self.client = OpenAI(api_key=openai_api_key)
-        self.rate_limit_delay = rate_limit_delay
-        self.last_api_call = 0
+        self.backend = backend or OpenAIBackend(openai_api_key, model)
+        self.prompt_template = prompt_template or get_template()
+        # Regenerating only helps when the backend reads the correction hint
+        self.max_regenerations = max_regenerations if getattr(self.backend, 'follows_instructions', True) else 0
+        self.rate_limiter = rate_limiter or PriorityRateLimiter(rate_limit_delay)
+        self.rate_limit_delay = self.rate_limiter.min_interval
         
-    def _wait_for_rate_limit(self):
+    def _wait_for_rate_limit(self, priority: int = PRIORITY_BULK):
         """Enforce rate limiting between API calls"""
-        current_time = time.time()
-        time_since_last_call = current_time - self.last_api_call
-        if time_since_last_call < self.rate_limit_delay:
-            sleep_time = self.rate_limit_delay - time_since_last_call
-            logger.debug(f"Rate limiting: sleeping for {sleep_time:.2f} seconds")
-            time.sleep(sleep_time)
-        self.last_api_call = time.time()
+        with span("rate_limit_wait", "rate_limit", priority=priority):
+            waited = self.rate_limiter.acquire(priority)
+        if waited > 0:
+            logger.debug(f"Rate limiting: waited {waited:.2f} seconds (priority {priority})")
     
-    def generate_alt_text(self, image_url: str, context: str = "", retry_count: int = 3) -> str:
+    def generate_alt_text(self, image_url: str, context: Union[str, Dict[str, str]] = "", retry_count: int = 3,
+                          priority: int = PRIORITY_BULK, correction: str = "") -> Optional[str]:
         """
         Generate alt text for a single image with rate limiting and retries
         
         Args:
             image_url: URL of the image
-            context: Additional context about the image placement
+            context: Additional context about the image placement, as text or as
+                a dictionary of page context (see ImageInfo.context)
             retry_count: Number of retries on rate limit errors
+            priority: Rate limit lane; PRIORITY_INTERACTIVE jumps ahead of bulk work
+            correction: Hint about why a previous answer was rejected
             
         Returns:
-            Generated alt text
+            Generated alt text (possibly empty), or None if the backend call
+            failed or stayed rate limited after every retry
         """
+        instructions, context_text = self._prompt(context, correction)
+        
         # Apply rate limiting before making the API call
-        self._wait_for_rate_limit()
+        self._wait_for_rate_limit(priority)
         
         for attempt in range(retry_count):
             try:
-                # Prepare the prompt
-                prompt = """Generate concise, descriptive alt text for this image. 
-                The alt text should:
-                - Be brief but descriptive (under 125 characters)
-                - Describe what the image shows, not what it looks like
-                - Include relevant context for screen readers
-                - Be written in a natural, human-friendly way
-                """
-                
-                if context:
-                    prompt += f"\nAdditional context: {context}"
-                
-                # Call OpenAI Vision API
-                response = self.client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {"type": "text", "text": prompt},
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": image_url,
-                                        "detail": "auto"
-                                    }
-                                }
-                            ]
-                        }
-                    ],
-                    max_tokens=300
-                )
-                
-                alt_text = response.choices[0].message.content.strip()
+                # Call the vision backend
+                with span("api_call", "vision", backend=self.backend.name, image_url=image_url, attempt=attempt):
+                    alt_text = self.backend.describe(image_url, instructions, context_text, max_tokens=300)
                 logger.info(f"Generated alt text for {image_url}: {alt_text}")
                 return alt_text
                 
             except Exception as e:
-                error_message = str(e)
-                
-                # Check if it's a rate limit error
-                if "rate_limit_exceeded" in error_message or "429" in error_message:
-                    if attempt < retry_count - 1:
-                        # Calculate backoff time
-                        backoff_time = 2 ** attempt + 1  # Exponential backoff: 2, 3, 5 seconds
-                        logger.warning(f"Rate limit hit for {image_url}. Retrying in {backoff_time} seconds... (attempt {attempt + 1}/{retry_count})")
-                        time.sleep(backoff_time)
+                backoff_time = self._retry_delay(e, image_url, attempt, retry_count)
+                if backoff_time is None:
+                    return None
+                time.sleep(backoff_time)
+                # Queue again so retries do not jump ahead of other lanes
+                self._wait_for_rate_limit(priority)
+        
+        return None
+    
+    def generate_validated_alt_text(self, image_url: str, context: Union[str, Dict[str, str]] = "",
+                                    priority: int = PRIORITY_BULK,
+                                    duplicates: Optional[DuplicateTracker] = None) -> str:
+        """
+        Generate alt text and regenerate it while it fails validation
+        
+        Args:
+            image_url: URL of the image
+            context: Additional context about the image placement
+            priority: Rate limit lane
+            duplicates: Tracker of alt text already used for other images
+            
+        Returns:
+            Valid alt text, or "" if the backend failed or every attempt was rejected
+        """
+        correction = ""
+        for attempt in range(self.max_regenerations + 1):
+            alt_text, correction = self._review_alt_text(
+                image_url, self.generate_alt_text(image_url, context, priority=priority, correction=correction),
+                attempt, duplicates
+            )
+            if alt_text or not correction:
+                return alt_text
+        return ""
+    
+    def iter_alt_text(self, image_batches: Iterable[List[ImageInfo]], batch_size: int = 0,
+                      max_workers: int = 1, prefilter: bool = True,
+                      queue_size: int = 4, total_pages: int = 0) -> Iterator[Tuple[ImageInfo, str]]:
+        """
+        Generate alt text for a stream of image batches, yielding results as they complete
+        
+        Batches (for example the images of each page, as the crawler finds
+        them) are pulled on a producer thread through a bounded queue, so
+        generation starts with the first batch while later ones are still
+        being fetched. Size variants of an asset share one vision call, also
+        across batches.
+        
+        When the batches are pages and their number is known (total_pages),
+        the pre-filter counts the pages of each asset across batches. Small
+        assets that could turn out to be on every page are held back until
+        they are, or until all pages are in, so the "repeated on every page"
+        rule applies to the whole site rather than to each batch.
+        
+        Args:
+            image_batches: Iterable of ImageInfo lists
+            batch_size: Maximum number of images to process (0 for all)
+            max_workers: Number of images generated concurrently; all workers
+                still share this generator's rate limiter
+            prefilter: Classify images before any API call
+            queue_size: Number of batches buffered ahead of generation
+            total_pages: Number of batches when each batch is the images of one
+                page; 0 pre-filters every batch on its own
+            
+        Yields:
+            (image, alt_text) for every processed image; decorative images get
+            "" and are marked decorative, non-content images are left out and
+            failures get ""
+        """
+        logger.info(f"Rate limit delay: {self.rate_limit_delay} seconds between API calls")
+        
+        stop = threading.Event()
+        batches: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        end_of_batches = object()
+        
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def produce():
+            iterator = iter(image_batches)
+            try:
+                for batch in iterator:
+                    if not put(batch):
+                        return
+                put(end_of_batches)
+            except Exception as e:
+                put(e)
+            finally:
+                if hasattr(iterator, 'close'):
+                    iterator.close()
+        
+        threading.Thread(target=produce, name="alt-text-batches", daemon=True).start()
+        
+        groups: Dict[str, List[ImageInfo]] = {}  # Images of each asset being generated
+        asset_pages: Dict[str, set] = {}  # Pages each asset was found on so far
+        held: set = set()  # Assets in groups waiting for their page count (PENDING)
+        finished: Dict[str, Optional[Tuple[str, bool]]] = {}  # (alt text, decorative); None if skipped
+        pending = {}  # Future -> (asset ID, attempt)
+        duplicates = DuplicateTracker()
+        counts = {'seen': 0, 'successful': 0, 'failed': 0, 'decorative': 0, 'skipped': 0, 'regenerated': 0}
+        max_pending = max(1, max_workers) * 2
+        executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        
+        def submit(asset_id: str, correction: str = "", attempt: int = 0):
+            image = groups[asset_id][0]
+            logger.info(f"Processing: {image.url}")
+            context = dict(image.context, page=image.page or "homepage") if image.page is not None else image.context
+            future = executor.submit(self.generate_alt_text, image.analysis_url or image.url, context,
+                                     priority=PRIORITY_BULK, correction=correction)
+            pending[future] = (asset_id, attempt)
+        
+        def admit(batch: List[ImageInfo]) -> List[Tuple[ImageInfo, str]]:
+            """Queue a batch for generation; returns results that are already known"""
+            ready = []
+            new_assets = []
+            for image in batch:
+                if batch_size and counts['seen'] >= batch_size:
+                    break
+                counts['seen'] += 1
+                if image.current_alt:  # Only process images without alt text
+                    logger.info(f"Skipping {image.url} - already has alt text: {image.current_alt}")
+                    continue
+                asset_id = image.asset_id or canonical_image_url(image.url)
+                asset_pages.setdefault(asset_id, set()).add(image.page)
+                if asset_id in finished:
+                    if finished[asset_id] is not None:
+                        alt_text, image.decorative = finished[asset_id]
+                        ready.append((image, alt_text))
+                elif asset_id in groups:
+                    logger.info(f"Reusing alt text generated for the same asset: {image.url}")
+                    groups[asset_id].append(image)
+                else:
+                    groups[asset_id] = [image]
+                    new_assets.append(asset_id)
+            
+            if prefilter and new_assets:
+                verdicts = prefilter_images(
+                    [img for asset_id in new_assets for img in groups[asset_id]],
+                    page_counts={asset_id: len(asset_pages[asset_id]) for asset_id in new_assets} if total_pages else None,
+                    total_pages=total_pages
+                )
+                for asset_id, (verdict, reason) in verdicts.items():
+                    if verdict == GENERATE:
+                        continue
+                    new_assets.remove(asset_id)
+                    if verdict == PENDING:
+                        logger.debug(f"Pre-filter: holding back {groups[asset_id][0].url} ({reason})")
+                        held.add(asset_id)
                         continue
+                    asset_images = groups.pop(asset_id)
+                    logger.info(f"Pre-filter: {verdict} {asset_images[0].url} ({reason})")
+                    if verdict == DECORATIVE:
+                        ready.extend(decorate(asset_id, asset_images))
                     else:
-                        logger.error(f"Rate limit exceeded after {retry_count} attempts for {image_url}")
-                        return ""
-                else:
-                    logger.error(f"Error generating alt text for {image_url}: {error_message}")
-                    return ""
+                        counts['skipped'] += 1
+                        finished[asset_id] = None
+            
+            # Held assets found on every page by now are site chrome
+            for asset_id in [asset_id for asset_id in held if len(asset_pages[asset_id]) >= total_pages]:
+                held.discard(asset_id)
+                asset_images = groups.pop(asset_id)
+                logger.info(f"Pre-filter: {DECORATIVE} {asset_images[0].url} (small image repeated on every page)")
+                ready.extend(decorate(asset_id, asset_images))
+            
+            for asset_id in new_assets:
+                submit(asset_id)
+            return ready
         
-        return ""
+        def decorate(asset_id: str, asset_images: List[ImageInfo]) -> List[Tuple[ImageInfo, str]]:
+            """Mark an asset decorative; returns its results"""
+            counts['decorative'] += 1
+            finished[asset_id] = ("", True)
+            for image in asset_images:
+                image.decorative = True
+            return [(image, "") for image in asset_images]
+        
+        def complete(future) -> List[Tuple[ImageInfo, str]]:
+            """Validate a finished generation; returns its results unless it was re-queued"""
+            asset_id, attempt = pending.pop(future)
+            asset_images = groups[asset_id]
+            
+            # Validate as results arrive and re-queue rejected ones with an
+            # adjusted prompt in the same pool
+            alt_text, correction = self._review_alt_text(
+                asset_images[0].url, future.result(), attempt, duplicates, asset_id=asset_id
+            )
+            if not alt_text and correction and attempt < self.max_regenerations:
+                counts['regenerated'] += 1
+                submit(asset_id, correction, attempt + 1)
+                return []
+            
+            del groups[asset_id]
+            finished[asset_id] = (alt_text, False)
+            done = counts['successful'] + counts['failed'] + 1
+            if alt_text:
+                counts['successful'] += 1
+                logger.info(f"[{done}] ✓ Success: Generated alt text for {asset_images[0].url}")
+            else:
+                counts['failed'] += 1
+                logger.warning(f"[{done}] ✗ Failed: Could not generate alt text for {asset_images[0].url}")
+            return [(image, alt_text) for image in asset_images]
+        
+        producer_done = False
+        try:
+            while not producer_done or pending or held:
+                if not producer_done and batch_size and counts['seen'] >= batch_size:
+                    # Budget used up; stop crawling
+                    producer_done = True
+                    stop.set()
+                
+                # Take the next batch while the pool has room; without work in
+                # flight, block until the producer delivers
+                if not producer_done and len(pending) < max_pending:
+                    try:
+                        item = batches.get(timeout=0.05 if pending else None)
+                    except queue.Empty:
+                        item = None
+                    if item is end_of_batches:
+                        producer_done = True
+                    elif isinstance(item, Exception):
+                        raise item
+                    elif item is not None:
+                        yield from admit(item)
+                
+                if producer_done and held:
+                    # All pages are in; assets still held are not on every page
+                    for asset_id in held:
+                        submit(asset_id)
+                    held.clear()
+                
+                if pending:
+                    block = producer_done or len(pending) >= max_pending
+                    done_futures, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+                    for future in done_futures:
+                        yield from complete(future)
+        finally:
+            stop.set()
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+        
+        if counts['regenerated']:
+            logger.info(f"Regenerated {counts['regenerated']} rejected alt texts")
+        logger.info(f"Batch processing complete: {counts['successful']} successful, {counts['failed']} failed "
+                    f"({counts['decorative']} decorative, {counts['skipped']} skipped, {counts['seen']} images)")
     
-    def generate_batch_alt_text(self, images: List[ImageInfo], batch_size: int = 0) -> Dict[str, str]:
+    def generate_batch_alt_text(self, images: List[ImageInfo], batch_size: int = 0,
+                                max_workers: int = 1, prefilter: bool = True) -> Dict[str, str]:
         """
         Generate alt text for multiple images with rate limiting
         
         Args:
             images: List of ImageInfo objects
             batch_size: Maximum number of images to process (0 for all)
+            max_workers: Number of images generated concurrently; all workers
+                still share this generator's rate limiter
+            prefilter: Classify images before any API call; decorative images
+                get "" and are marked decorative, non-content images are left out
             
         Returns:
             Dictionary mapping image URLs to generated alt text
         """
+        logger.info(f"Starting batch processing of {len(images)} images...")
         results = {}
-        images_to_process = images[:batch_size] if batch_size > 0 else images
-        total = len(images_to_process)
-        successful = 0
-        failed = 0
-        
-        logger.info(f"Starting batch processing of {total} images...")
-        logger.info(f"Rate limit delay: {self.rate_limit_delay} seconds between API calls")
-        
-        for i, image in enumerate(images_to_process, 1):
-            if not image.current_alt:  # Only process images without alt text
-                logger.info(f"[{i}/{total}] Processing: {image.url}")
-                alt_text = self.generate_alt_text(image.url)
-                
-                if alt_text:
-                    results[image.url] = alt_text
-                    successful += 1
-                    logger.info(f"[{i}/{total}] ✓ Success: Generated alt text")
-                else:
-                    results[image.url] = ""
-                    failed += 1
-                    logger.warning(f"[{i}/{total}] ✗ Failed: Could not generate alt text")
-            else:
-                logger.info(f"[{i}/{total}] Skipping {image.url} - already has alt text: {image.current_alt}")
-        
-        logger.info(f"Batch processing complete: {successful} successful, {failed} failed out of {total} images")
+        for image, alt_text in self.iter_alt_text([images], batch_size, max_workers, prefilter):
+            results[image.url] = alt_text
         return results
 
 
+class PageCache:
+    """
+    Thread-safe cache of parsed per-page image lists
+
+    Entries are served directly while younger than ``ttl`` seconds. Older
+    entries are revalidated with a conditional request using the stored ETag
+    or Last-Modified value, so unchanged pages are not downloaded or parsed
+    again.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 1000):
+        """
+        Args:
+            ttl: Seconds an entry is served without revalidation
+            max_entries: Maximum number of pages kept (oldest evicted first)
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Return the cache entry for a page URL, fresh or stale"""
+        with self._lock:
+            return self._entries.get(url)
+
+    def is_fresh(self, entry: Dict) -> bool:
+        """Whether an entry can be served without revalidation"""
+        return time.time() - entry['timestamp'] < self.ttl
+
+    def put(self, url: str, images: List[ImageInfo], etag: Optional[str] = None,
+            last_modified: Optional[str] = None):
+        """Store the parsed images of a page together with its validators"""
+        with self._lock:
+            if url not in self._entries and len(self._entries) >= self.max_entries:
+                oldest = min(self._entries, key=lambda key: self._entries[key]['timestamp'])
+                del self._entries[oldest]
+            self._entries[url] = {
+                'images': images,
+                'etag': etag,
+                'last_modified': last_modified,
+                'timestamp': time.time()
+            }
+
+    def touch(self, url: str):
+        """Mark an entry as freshly validated"""
+        with self._lock:
+            if url in self._entries:
+                self._entries[url]['timestamp'] = time.time()
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+
+
 class FramerSiteAnalyzer:
     """Analyzes Framer sites to find images without alt text"""
     
-    def __init__(self, site_url: str):
+    def __init__(self, site_url: str, page_cache: Optional[PageCache] = None, max_workers: int = 8):
         """
         Initialize with Framer site URL
         
         Args:
             site_url: URL of the Framer site
+            page_cache: Optional cache of parsed pages shared between analyzers
+            max_workers: Maximum number of pages fetched concurrently
         """
         self.site_url = site_url.rstrip('/')
+        self.page_cache = page_cache
+        self.max_workers = max(1, max_workers)
+        
+    def _page_url(self, path: str = "") -> str:
+        """Build the absolute URL of a page path"""
+        return f"{self.site_url}/{path}" if path else self.site_url
         
     def fetch_page_content(self, path: str = "") -> str:
         """
@@ -190,18 +681,77 @@ class FramerSiteAnalyzer:
         Returns:
             HTML content
         """
-        url = f"{self.site_url}/{path}" if path else self.site_url
+        import requests
+        
+        url = self._page_url(path)
         
         try:
-            response = requests.get(url, headers={
-                'User-Agent': 'Mozilla/5.0 (compatible; AltTextBot/1.0)'
-            })
+            with span("fetch", "http", url=url):
+                response = requests.get(url, headers={
+                    'User-Agent': 'Mozilla/5.0 (compatible; AltTextBot/1.0)'
+                })
             response.raise_for_status()
             return response.text
         except requests.RequestException as e:
             logger.error(f"Error fetching {url}: {str(e)}")
             return ""
     
+    def get_page_images(self, path: str = "", revalidate: bool = False) -> List[ImageInfo]:
+        """
+        Get all images on a page, using the page cache when available
+        
+        Args:
+            path: Page path (empty for homepage)
+            revalidate: Check a cached page with the server even if it is fresh
+            
+        Returns:
+            List of ImageInfo objects (copies, safe to modify)
+        """
+        if self.page_cache is None:
+            content = self.fetch_page_content(path)
+            if not content:
+                return []
+            with span("parse", "html", url=self._page_url(path), bytes=len(content)):
+                return self.extract_images(content)
+        
+        import requests
+        
+        url = self._page_url(path)
+        entry = self.page_cache.get(url)
+        if entry and not revalidate and self.page_cache.is_fresh(entry):
+            logger.debug(f"Page cache hit for {url}")
+            return [replace(img) for img in entry['images']]
+        
+        headers = {'User-Agent': 'Mozilla/5.0 (compatible; AltTextBot/1.0)'}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        
+        try:
+            with span("fetch", "http", url=url, conditional=entry is not None) as fetch_span:
+                response = requests.get(url, headers=headers)
+            if fetch_span is not None:
+                fetch_span.args["status"] = response.status_code
+            if response.status_code == 304 and entry:
+                logger.debug(f"Page not modified, reusing cached parse for {url}")
+                self.page_cache.touch(url)
+                return [replace(img) for img in entry['images']]
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.error(f"Error fetching {url}: {str(e)}")
+            return []
+        
+        with span("parse", "html", url=url, bytes=len(response.content)):
+            images = self.extract_images(response.text)
+        self.page_cache.put(
+            url, images,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified')
+        )
+        return [replace(img) for img in images]
+    
     def extract_images(self, html_content: str) -> List[ImageInfo]:
         """
         Extract image information from HTML content
@@ -220,30 +770,42 @@ class FramerSiteAnalyzer:
         # Find all img tags
         for img in soup.find_all('img'):
             src = img.get('src', '')
-            if not src:
+            
+            # Collect srcset candidates, including <picture><source> siblings
+            candidates = parse_srcset(img.get('srcset', ''))
+            picture = img.find_parent('picture')
+            if picture:
+                for source in picture.find_all('source'):
+                    candidates.extend(parse_srcset(source.get('srcset', '')))
+            candidates = [(self._absolute_url(url), width, density) for url, width, density in candidates]
+            
+            if not src and not candidates:
                 continue
-                
-            # Convert relative URLs to absolute
-            if src.startswith('//'):
-                src = f"https:{src}"
-            elif src.startswith('/'):
-                src = f"{self.site_url}{src}"
-            elif not src.startswith(('http://', 'https://')):
-                src = f"{self.site_url}/{src}"
+            
+            # Lazy-loaded images may carry only a data: placeholder in src
+            src = self._absolute_url(src) if src else ''
+            if (not src or src.startswith('data:')) and candidates:
+                src = candidates[0][0]
             
             # Get existing alt text
             alt = img.get('alt', '')
             
             # Get element ID and build selector
             element_id = img.get('id', '')
-            classes = img.get('class', [])
             selector = self._build_selector(img)
             
             images.append(ImageInfo(
                 url=src,
                 current_alt=alt if alt else None,
                 selector=selector,
-                element_id=element_id
+                element_id=element_id,
+                asset_id=canonical_image_url(src),
+                analysis_url=choose_analysis_candidate(src, candidates),
+                role=img.get('role'),
+                aria_hidden=self._is_aria_hidden(img),
+                width=self._int_attribute(img, 'width'),
+                height=self._int_attribute(img, 'height'),
+                context=self._image_context(img)
             ))
         
         # Also check for background images in divs with role="img"
@@ -251,14 +813,9 @@ class FramerSiteAnalyzer:
             style = div.get('style', '')
             if 'background-image' in style:
                 # Extract URL from style
-                import re
                 url_match = re.search(r'url\(["\']?([^"\']+)["\']?\)', style)
                 if url_match:
-                    src = url_match.group(1)
-                    if src.startswith('//'):
-                        src = f"https:{src}"
-                    elif src.startswith('/'):
-                        src = f"{self.site_url}{src}"
+                    src = self._absolute_url(url_match.group(1))
                     
                     alt = div.get('aria-label', '')
                     element_id = div.get('id', '')
@@ -268,11 +825,62 @@ class FramerSiteAnalyzer:
                         url=src,
                         current_alt=alt if alt else None,
                         selector=selector,
-                        element_id=element_id
+                        element_id=element_id,
+                        asset_id=canonical_image_url(src),
+                        analysis_url=choose_analysis_candidate(src, []),
+                        role='img',
+                        aria_hidden=self._is_aria_hidden(div),
+                        context=self._image_context(div)
                     ))
         
         return images
     
+    @staticmethod
+    def _image_context(element) -> Dict[str, str]:
+        """Collect surrounding text that helps describe an image"""
+        context = {}
+        
+        heading = element.find_previous(['h1', 'h2', 'h3'])
+        if heading:
+            context['heading'] = heading.get_text(' ', strip=True)
+        
+        figure = element.find_parent('figure')
+        caption = figure.find('figcaption') if figure else None
+        if caption:
+            context['caption'] = caption.get_text(' ', strip=True)
+        
+        link = element.find_parent('a')
+        if link:
+            context['link_text'] = link.get_text(' ', strip=True) or link.get('aria-label', '')
+        
+        if element.get('title'):
+            context['title'] = element['title']
+        
+        return {key: value for key, value in context.items() if value}
+    
+    @staticmethod
+    def _is_aria_hidden(element) -> bool:
+        """Whether an element or one of its ancestors is hidden from screen readers"""
+        if element.get('aria-hidden') == 'true':
+            return True
+        return element.find_parent(attrs={'aria-hidden': 'true'}) is not None
+    
+    @staticmethod
+    def _int_attribute(element, name: str) -> Optional[int]:
+        """Read a numeric attribute, e.g. width="64" or width="64px" as 64"""
+        match = re.match(r'\s*(\d+)', element.get(name) or '')
+        return int(match.group(1)) if match else None
+    
+    def _absolute_url(self, src: str) -> str:
+        """Convert a relative image URL to an absolute one"""
+        if src.startswith('//'):
+            return f"https:{src}"
+        if src.startswith('/'):
+            return f"{self.site_url}{src}"
+        if not src.startswith(('http://', 'https://', 'data:')):
+            return f"{self.site_url}/{src}"
+        return src
+    
     def _build_selector(self, element) -> str:
         """Build a CSS selector for an element"""
         selector_parts = []
@@ -291,29 +899,87 @@ class FramerSiteAnalyzer:
         
         return ''.join(selector_parts)
     
-    def find_images_without_alt(self, pages: List[str] = None) -> List[ImageInfo]:
+    def find_images(self, pages: List[str] = None, revalidate: bool = False) -> List[ImageInfo]:
         """
-        Find all images without alt text across specified pages
+        Find all images, with or without alt text, across specified pages
         
         Args:
             pages: List of page paths to check (None for homepage only)
+            revalidate: Check cached pages with the server even if they are fresh
             
         Returns:
-            List of ImageInfo objects for images without alt text
+            List of ImageInfo objects in page order
         """
         if pages is None:
             pages = ['']  # Just check homepage
         
         all_images = []
-        images_without_alt = []
         
-        for page in pages:
-            logger.info(f"Analyzing page: {page if page else 'homepage'}")
-            content = self.fetch_page_content(page)
-            if content:
-                images = self.extract_images(content)
+        # Fetch pages concurrently; map() keeps results in page order
+        workers = min(self.max_workers, len(pages)) or 1
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for images in executor.map(lambda page: self._analyze_page(page, revalidate), pages):
                 all_images.extend(images)
         
+        return all_images
+    
+    def _analyze_page(self, page: str, revalidate: bool = False) -> List[ImageInfo]:
+        """Images of one page, tagged with the page path"""
+        logger.info(f"Analyzing page: {page if page else 'homepage'}")
+        images = self.get_page_images(page, revalidate=revalidate)
+        for image in images:
+            image.page = page
+        return images
+    
+    def iter_images_without_alt(self, pages: List[str] = None) -> Iterator[List[ImageInfo]]:
+        """
+        Yield the images without alt text of each page as soon as it is analyzed
+        
+        Pages are fetched concurrently and yielded in the order they finish.
+        Closing the iterator cancels pages that have not started yet.
+        
+        Args:
+            pages: List of page paths to check (None for homepage only)
+            
+        Yields:
+            List of ImageInfo objects without alt text, one list per page
+        """
+        if pages is None:
+            pages = ['']
+        
+        found = 0
+        total = 0
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(pages)) or 1)
+        futures = [executor.submit(self._analyze_page, page) for page in pages]
+        try:
+            for future in as_completed(futures):
+                images = future.result()
+                images_without_alt = [img for img in images if not img.current_alt]
+                for img in images_without_alt:
+                    logger.info(f"Found image without alt text: {img.url}")
+                found += len(images_without_alt)
+                total += len(images)
+                yield images_without_alt
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+        
+        logger.info(f"Found {found} images without alt text out of {total} total images")
+    
+    def find_images_without_alt(self, pages: List[str] = None) -> List[ImageInfo]:
+        """
+        Find all images without alt text across specified pages
+        
+        Args:
+            pages: List of page paths to check (None for homepage only)
+            
+        Returns:
+            List of ImageInfo objects for images without alt text
+        """
+        all_images = self.find_images(pages)
+        images_without_alt = []
+        
         # Filter images without alt text
         for img in all_images:
             if not img.current_alt:
@@ -324,12 +990,239 @@ class FramerSiteAnalyzer:
         return images_without_alt
 
 
-def main():
-    """Main function to run the alt text generator"""
+def build_results_output(site_url: str, images: List[ImageInfo], alt_text_results: Dict[str, str],
+                         prompt_version: Optional[str] = None) -> Dict:
+    """
+    Build the alt_text_results.json document
+    
+    Args:
+        site_url: URL of the analyzed site
+        images: Images that were considered for generation
+        alt_text_results: Dictionary mapping image URLs to generated alt text
+        prompt_version: Key of the prompt template the alt text was generated with
+        
+    Returns:
+        JSON-serializable results document
+    """
+    output = {
+        "site_url": site_url,
+        "prompt_version": prompt_version,
+        "images_processed": len(alt_text_results),
+        "results": []
+    }
+    
+    for image in images:
+        if image.url in alt_text_results:
+            output["results"].append(result_entry(image, alt_text_results[image.url]))
+    
+    return output
+
+
+def result_entry(image: ImageInfo, alt_text: str) -> Dict:
+    """One entry of the results document"""
+    return {
+        "url": image.url,
+        "selector": image.selector,
+        "element_id": image.element_id,
+        "asset_id": image.asset_id,
+        "page": image.page,
+        "generated_alt_text": alt_text,
+        "decorative": image.decorative
+    }
+
+
+class ResultsWriter:
+    """
+    Output sink for results that arrive one by one
+    
+    Every result is appended to an NDJSON stream file as soon as it arrives,
+    so progress is visible and survives an interrupted run, and is recorded
+    in the result store in small batches. close() writes the complete
+    results document; after an error the document is left untouched.
+    """
+    
+    def __init__(self, output_file: str, site_url: str, prompt_version: Optional[str] = None,
+                 stream_file: Optional[str] = None, result_store=None, model: Optional[str] = None,
+                 store_every: int = 50):
+        """
+        Args:
+            output_file: Results document (alt_text_results.json)
+            site_url: URL of the analyzed site
+            prompt_version: Key of the prompt template the alt text is generated with
+            stream_file: NDJSON file receiving results as they arrive
+                (default: output_file with a .ndjson extension)
+            result_store: ResultStore to record results in, if any
+            model: Vision backend name recorded in the result store
+            store_every: Number of results written to the store at once
+        """
+        self.output_file = output_file
+        self.site_url = site_url
+        self.prompt_version = prompt_version
+        self.stream_file = stream_file or f"{os.path.splitext(output_file)[0]}.ndjson"
+        self.result_store = result_store
+        self.model = model
+        self.store_every = store_every
+        self.results: List[Dict] = []
+        self._urls = set()
+        self._stream = None
+        self._unstored: List[Dict] = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(write_document=exc_type is None)
+    
+    def add(self, image: ImageInfo, alt_text: str):
+        """Write one result"""
+        entry = result_entry(image, alt_text)
+        self.results.append(entry)
+        self._urls.add(image.url)
+        
+        with span("write", "io", file=self.stream_file):
+            if self._stream is None:
+                self._stream = open(self.stream_file, "w")
+            self._stream.write(json.dumps(entry) + "\n")
+            self._stream.flush()
+        
+        if self.result_store:
+            self._unstored.append(entry)
+            if len(self._unstored) >= self.store_every:
+                self._flush_store()
+    
+    def _flush_store(self):
+        """Record buffered results in the result store"""
+        if self.result_store and self._unstored:
+            self.result_store.record(self.site_url, self._unstored, model=self.model,
+                                     prompt_version=self.prompt_version, source="cli")
+            self._unstored = []
+    
+    def document(self) -> Dict:
+        """The results document for everything written so far"""
+        return {
+            "site_url": self.site_url,
+            "prompt_version": self.prompt_version,
+            "images_processed": len(self._urls),
+            "results": list(self.results)
+        }
+    
+    def close(self, write_document: bool = True) -> Dict:
+        """
+        Flush everything and write the results document
+        
+        Returns:
+            The results document
+        """
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        self._flush_store()
+        
+        output = self.document()
+        if write_document and self.results:
+            with span("write", "io", file=self.output_file, results=len(self.results)):
+                tmp_file = f"{self.output_file}.tmp"
+                with open(tmp_file, "w") as f:
+                    json.dump(output, f, indent=2)
+                os.replace(tmp_file, self.output_file)
+        return output
+
+
+def diff_alt_text_results(site_images: List[ImageInfo], results: List[Dict], overwrite: bool = False) -> Dict:
+    """
+    Compare generated alt text with the alt text currently on the site
+    
+    Both sides are keyed by canonical image URL, so results match every size
+    variant of an asset. For duplicate results the last one wins.
+    
+    Args:
+        site_images: All images found on the site (see FramerSiteAnalyzer.find_images)
+        results: Generated results with "url" and "alt_text" (or "generated_alt_text")
+        overwrite: Also replace alt text that is already set on the site;
+            by default only images without alt text are changed
+        
+    Returns:
+        Dictionary with "changes" (assets whose alt text differs on the site),
+        "unchanged" (count of assets already up to date), "kept" (asset IDs
+        whose existing alt text is left alone), "not_on_site" (asset IDs of
+        results that do not appear on the analyzed pages) and "skip_urls"
+        (result URLs of unchanged and kept assets, which must not be applied)
+    """
+    generated: Dict[str, Dict] = {}
+    for result in results:
+        url = result.get('url')
+        alt_text = (result.get('alt_text') or result.get('generated_alt_text') or '').strip()
+        if not url or not alt_text:
+            continue
+        asset_id = canonical_image_url(url)
+        entry = generated.setdefault(asset_id, {'alt_text': alt_text, 'result_urls': []})
+        entry['alt_text'] = alt_text
+        if url not in entry['result_urls']:
+            entry['result_urls'].append(url)
+    
+    on_site: Dict[str, List[ImageInfo]] = {}
+    for image in site_images:
+        on_site.setdefault(image.asset_id or canonical_image_url(image.url), []).append(image)
+    
+    changes = []
+    unchanged = 0
+    kept = []
+    not_on_site = []
+    skip_urls = []
+    for asset_id, entry in generated.items():
+        instances = on_site.get(asset_id)
+        if not instances:
+            not_on_site.append(asset_id)
+            continue
+        
+        outdated = [image for image in instances if (image.current_alt or '') != entry['alt_text']]
+        if not outdated:
+            unchanged += 1
+            skip_urls.extend(entry['result_urls'])
+            continue
+        
+        if not overwrite:
+            # Existing alt text was most likely written by a person
+            outdated = [image for image in outdated if not (image.current_alt or '').strip()]
+            if not outdated:
+                kept.append(asset_id)
+                skip_urls.extend(entry['result_urls'])
+                continue
+        
+        changes.append({
+            'asset_id': asset_id,
+            'alt_text': entry['alt_text'],
+            'current_alt': outdated[0].current_alt,
+            'result_urls': entry['result_urls'],
+            'site_urls': sorted({image.url for image in outdated}),
+            'element_ids': sorted({image.element_id for image in outdated if image.element_id})
+        })
+    
+    return {
+        'changes': changes,
+        'unchanged': unchanged,
+        'kept': kept,
+        'not_on_site': not_on_site,
+        'skip_urls': skip_urls
+    }
+
+
+def main() -> int:
+    """
+    Main function to run the alt text generator
+    
+    Returns:
+        Exit status: 0 on success, 1 on a configuration error or failed auto-apply
+    """
+    
+    from dotenv import load_dotenv
     
     # Load environment variables from .env file
     load_dotenv()
     
+    # ALT_TEXT_TRACE / ALT_TEXT_PROFILE_DIR turn on tracing and profiling
+    configure_tracing()
+    
     # Load configuration
     config = {
         "openai_api_key": os.environ.get("OPENAI_API_KEY", ""),
@@ -337,75 +1230,73 @@ def main():
         "pages_to_check": os.environ.get("PAGES_TO_CHECK", "").split(",") if os.environ.get("PAGES_TO_CHECK") else [""],
         "auto_apply": os.environ.get("AUTO_APPLY", "false").lower() == "true",
         "rate_limit_delay": float(os.environ.get("RATE_LIMIT_DELAY", "2.0")),  # Default 2 seconds between API calls
-        "batch_size": int(os.environ.get("BATCH_SIZE", "0"))  # 0 means process all
+        "batch_size": int(os.environ.get("BATCH_SIZE", "0")),  # 0 means process all
+        "concurrency": int(os.environ.get("CONCURRENCY", "1")),  # Images generated in parallel
+        "prefilter": os.environ.get("PREFILTER", "true").lower() == "true"
     }
     
     # Validate configuration
-    if not config["openai_api_key"]:
+    if not config["openai_api_key"] and backend_requires_openai_key():
         logger.error("OPENAI_API_KEY environment variable is required")
-        return
+        return 1
     
     if not config["framer_site_url"]:
         logger.error("FRAMER_SITE_URL environment variable is required")
-        return
+        return 1
     
     # Initialize components
     analyzer = FramerSiteAnalyzer(config["framer_site_url"])
-    generator = AltTextGenerator(config["openai_api_key"], rate_limit_delay=config["rate_limit_delay"])
-    
-    # Find images without alt text
-    logger.info(f"Analyzing Framer site: {config['framer_site_url']}")
-    images_without_alt = analyzer.find_images_without_alt(config["pages_to_check"])
+    generator = AltTextGenerator(
+        config["openai_api_key"],
+        rate_limit_delay=config["rate_limit_delay"],
+        backend=backend_from_env(config["openai_api_key"])
+    )
     
-    if not images_without_alt:
-        logger.info("All images have alt text!")
-        return
+    from result_store import result_store_from_env
     
-    # Generate alt text for images
-    images_to_process = len(images_without_alt) if config["batch_size"] == 0 else min(config["batch_size"], len(images_without_alt))
-    logger.info(f"Generating alt text for {images_to_process} images (found {len(images_without_alt)} total)...")
-    alt_text_results = generator.generate_batch_alt_text(images_without_alt, batch_size=config["batch_size"])
+    output_file = "alt_text_results.json"
+    writer = ResultsWriter(
+        output_file, config["framer_site_url"], prompt_version=generator.prompt_template.key,
+        result_store=result_store_from_env(), model=generator.backend.name
+    )
     
-    # Save results to JSON
-    output = {
-        "site_url": config["framer_site_url"],
-        "images_processed": len(alt_text_results),
-        "results": []
-    }
+    # Pages are analyzed while images found on earlier pages are already being
+    # generated; results are written as they complete
+    logger.info(f"Analyzing Framer site: {config['framer_site_url']}")
+    with profiled("generate"), writer:
+        for image, alt_text in generator.iter_alt_text(
+            analyzer.iter_images_without_alt(config["pages_to_check"]),
+            batch_size=config["batch_size"], max_workers=config["concurrency"],
+            prefilter=config["prefilter"], total_pages=len(config["pages_to_check"])
+        ):
+            writer.add(image, alt_text)
     
-    for image in images_without_alt:
-        if image.url in alt_text_results:
-            output["results"].append({
-                "url": image.url,
-                "selector": image.selector,
-                "element_id": image.element_id,
-                "generated_alt_text": alt_text_results[image.url]
-            })
-    
-    # Save to file
-    output_file = "alt_text_results.json"
-    with open(output_file, "w") as f:
-        json.dump(output, f, indent=2)
+    if not writer.results:
+        logger.info("All images have alt text!")
+        return 0
     
-    logger.info(f"Results saved to {output_file}")
+    output = writer.document()
+    logger.info(f"Results saved to {output_file} (streamed to {writer.stream_file})")
     print(json.dumps(output, indent=2))
     
     # Auto-apply if configured
     if config.get("auto_apply"):
         logger.info("\nAuto-apply is enabled. Attempting to apply alt text to Framer site...")
         try:
-            from apply_alt_text import FramerAltTextApplier
+            from apply_alt_text import FramerAltTextApplier, applier_options_from_env
             
             framer_email = os.environ.get("FRAMER_EMAIL")
             framer_password = os.environ.get("FRAMER_PASSWORD")
             use_google_login = os.environ.get("USE_GOOGLE_LOGIN", "false").lower() == "true"
             
             if framer_email:
-                applier = FramerAltTextApplier(framer_email, framer_password, use_google_login)
+                applier = FramerAltTextApplier(
+                    framer_email, framer_password, use_google_login, **applier_options_from_env()
+                )
                 applier.setup_driver()
                 applier.login_to_framer()
                 applier.open_project(config["framer_site_url"])
-                applier.apply_alt_texts_from_file(output_file)
+                applier.apply_alt_texts_from_file(output_file, workers=int(os.environ.get("APPLY_WORKERS", "1")))
                 
                 # Ask for publish confirmation
                 response = input("\nDo you want to publish the changes? (y/n): ")
@@ -422,9 +1313,13 @@ def main():
                 
         except ImportError:
             logger.warning("Selenium not installed. Run: pip install selenium")
+            return 1
         except Exception as e:
             logger.error(f"Failed to auto-apply: {str(e)}")
+            return 1
+    
+    return 0
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
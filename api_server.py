@@ -4,25 +4,64 @@ Flask API server for Alt Text Generator
 Provides REST endpoints for Framer plugin integration
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-from alt_text_generator import AltTextGenerator, FramerSiteAnalyzer, ImageInfo
+from werkzeug.exceptions import RequestEntityTooLarge
+from alt_text_generator import (
+    AltTextGenerator, FramerSiteAnalyzer, ImageInfo, PageCache, diff_alt_text_results,
+    get_cache_key, CACHE_TTL_SECONDS,
+    PriorityRateLimiter, PRIORITY_INTERACTIVE, PRIORITY_BULK
+)
+import io
 import os
+import json
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
 from functools import wraps
-import hashlib
 import time
+from image_urls import analysis_image_url
+from prompts import get_template
+from cache_snapshot import dump_snapshot, is_fresh, parse_cache_content, warm_cache
+from result_store import result_store_from_env
+from tracing import configure_tracing, span, start_profile, stop_profile, tracing_enabled
+from validation import DuplicateTracker
+from vision_backends import backend_from_env, backend_requires_openai_key
+import wire_format
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for Framer plugin
+app.json.compact = True  # No indentation, even in debug mode
+
+# Largest accepted request body, before and after decompression
+MAX_REQUEST_BYTES = int(os.environ.get('MAX_REQUEST_BYTES', str(50 * 1024 * 1024)))
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# ALT_TEXT_TRACE records a span per request (one file per worker process);
+# ALT_TEXT_PROFILE_DIR profiles each request
+configure_tracing(per_process=True)
+
 # Cache for generated alt texts (in production, use Redis)
 alt_text_cache: Dict[str, Dict] = {}
 
+# Start warm from snapshots or results files, so a new instance does not
+# pay full vision latency for alt text that was already generated
+if os.environ.get('CACHE_WARM_FILES'):
+    alt_text_cache.update(warm_cache(os.environ['CACHE_WARM_FILES']))
+
+# One rate limiter shared by every request, so that interactive /generate calls
+# are served ahead of /generate-batch work instead of competing with it
+rate_limiter = PriorityRateLimiter(float(os.environ.get('RATE_LIMIT_DELAY', '1.0')))
+
+# Parsed page image lists shared by /analyze calls; stale pages are revalidated
+# with their ETag so only changed pages are downloaded again
+page_cache = PageCache(ttl=float(os.environ.get('PAGE_CACHE_TTL', '300')))
+
+# History of every generated alt text, shared with the CLI and the scheduler
+result_store = result_store_from_env()
+
 
 def require_api_key(f):
     """Decorator to require API key for endpoints"""
@@ -38,9 +77,108 @@ def require_api_key(f):
     return decorated_function
 
 
-def get_cache_key(image_url: str) -> str:
-    """Generate cache key for an image URL"""
-    return hashlib.md5(image_url.encode()).hexdigest()
+def get_json_payload() -> Optional[Dict]:
+    """
+    Parse the JSON request body
+    
+    Bodies sent with Content-Encoding gzip or deflate are decompressed
+    first, so clients can compress large image lists.
+    
+    Returns:
+        Parsed payload, or None if the body is missing or invalid
+    """
+    try:
+        body = wire_format.decompress(
+            request.get_data(), request.headers.get('Content-Encoding'), MAX_REQUEST_BYTES
+        )
+    except wire_format.PayloadTooLarge:
+        raise RequestEntityTooLarge()
+    except ValueError as e:
+        logger.warning(f"Could not decode request body: {str(e)}")
+        return None
+    
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+def api_response(payload: Dict, status: int = 200):
+    """
+    Send a payload in the format the client asked for
+    
+    ?format=columns (or msgpack, also selected by Accept: application/msgpack)
+    sends record lists as one array per field instead of repeating every key.
+    """
+    response_format = wire_format.choose_format(request.args.get('format'), request.headers.get('Accept', ''))
+    if response_format == wire_format.FORMAT_JSON:
+        return jsonify(payload), status
+    
+    compact = wire_format.columnar_payload(payload)
+    compact['format'] = response_format
+    if response_format == wire_format.FORMAT_MSGPACK:
+        return Response(wire_format.pack(compact), status=status, mimetype='application/msgpack')
+    return jsonify(compact), status
+
+
+@app.before_request
+def start_request_trace():
+    """Open the request span and start the per-request profiler, when enabled"""
+    g.request_span = span('request', 'http', method=request.method, path=request.path)
+    g.request_span.__enter__()
+    g.profiler = start_profile()
+
+
+@app.after_request
+def record_response_status(response):
+    """Attach the response status to the request span"""
+    if tracing_enabled() and 'request_span' in g:
+        g.request_span.args['status'] = response.status_code
+    return response
+
+
+@app.teardown_request
+def finish_request_trace(exc):
+    """Close the request span and write the request profile"""
+    stop_profile(g.pop('profiler', None), f"{request.method}-{request.path}")
+    request_span = g.pop('request_span', None)
+    if request_span is not None:
+        request_span.__exit__(type(exc) if exc else None, exc, None)
+
+
+@app.after_request
+def compress_response(response):
+    """Compress JSON and msgpack responses with brotli or gzip when the client accepts it"""
+    if (response.direct_passthrough or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in ('application/json', 'application/msgpack', 'application/x-ndjson')):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(wire_format.supported_encodings())
+    if not encoding:
+        return response
+    
+    data = response.get_data()
+    if len(data) < wire_format.MIN_COMPRESS_BYTES:
+        return response
+    
+    response.set_data(wire_format.compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+_backend = None
+
+
+def get_backend(openai_key: str):
+    """Return the vision backend configured in the environment, created once"""
+    global _backend
+    if _backend is None:
+        _backend = backend_from_env(openai_key)
+    return _backend
 
 
 @app.route('/health', methods=['GET'])
@@ -65,7 +203,7 @@ def analyze_site():
         "pages": ["", "about", "contact"]  // Optional, defaults to homepage only
     }
     """
-    data = request.get_json()
+    data = get_json_payload()
     
     if not data or 'site_url' not in data:
         return jsonify({'error': 'site_url is required'}), 400
@@ -74,7 +212,11 @@ def analyze_site():
     pages = data.get('pages', [''])
     
     try:
-        analyzer = FramerSiteAnalyzer(site_url)
+        analyzer = FramerSiteAnalyzer(
+            site_url,
+            page_cache=page_cache,
+            max_workers=int(os.environ.get('ANALYZE_WORKERS', '8'))
+        )
         images_without_alt = analyzer.find_images_without_alt(pages)
         
         # Convert to JSON-serializable format
@@ -84,10 +226,11 @@ def analyze_site():
                 'url': img.url,
                 'selector': img.selector,
                 'element_id': img.element_id,
+                'asset_id': img.asset_id,
                 'current_alt': img.current_alt
             })
         
-        return jsonify({
+        return api_response({
             'site_url': site_url,
             'pages_analyzed': pages,
             'images_without_alt': results,
@@ -108,10 +251,12 @@ def generate_alt_text():
     Expected JSON payload:
     {
         "image_url": "https://example.com/image.jpg",
-        "context": "Optional context about the image"
+        "context": "Optional context about the image",  // Or {"heading": ..., "caption": ..., "link_text": ...}
+        "site_url": "https://example.framer.app",  // Optional, recorded in the result store
+        "page": "about"  // Optional, recorded in the result store
     }
     """
-    data = request.get_json()
+    data = get_json_payload()
     
     if not data or 'image_url' not in data:
         return jsonify({'error': 'image_url is required'}), 400
@@ -120,31 +265,38 @@ def generate_alt_text():
     context = data.get('context', '')
     
     # Check cache first
-    cache_key = get_cache_key(image_url)
-    if cache_key in alt_text_cache:
-        cached_data = alt_text_cache[cache_key]
-        if time.time() - cached_data['timestamp'] < 86400:  # 24 hour cache
-            logger.info(f"Returning cached alt text for {image_url}")
-            return jsonify({
-                'image_url': image_url,
-                'alt_text': cached_data['alt_text'],
-                'cached': True
-            })
+    cache_key = get_cache_key(image_url, get_template().key)
+    with span('cache_lookup', 'cache'):
+        cached_data = alt_text_cache.get(cache_key)
+    if cached_data and time.time() - cached_data['timestamp'] < CACHE_TTL_SECONDS:
+        logger.info(f"Returning cached alt text for {image_url}")
+        return jsonify({
+            'image_url': image_url,
+            'alt_text': cached_data['alt_text'],
+            'cached': True
+        })
     
     try:
         # Get OpenAI API key from environment
         openai_key = os.environ.get('OPENAI_API_KEY')
-        if not openai_key:
+        if not openai_key and backend_requires_openai_key():
             return jsonify({'error': 'OpenAI API key not configured'}), 500
         
-        generator = AltTextGenerator(openai_key)
-        alt_text = generator.generate_alt_text(image_url, context)
+        generator = AltTextGenerator(openai_key, rate_limiter=rate_limiter, backend=get_backend(openai_key))
+        alt_text = generator.generate_validated_alt_text(analysis_image_url(image_url), context, priority=PRIORITY_INTERACTIVE)
         
-        # Cache the result
-        alt_text_cache[cache_key] = {
-            'alt_text': alt_text,
-            'timestamp': time.time()
-        }
+        # Cache the result; failures are not cached so they are retried
+        if alt_text:
+            alt_text_cache[cache_key] = {
+                'alt_text': alt_text,
+                'timestamp': time.time()
+            }
+        
+        if result_store:
+            result_store.record(
+                data.get('site_url'), [{'url': image_url, 'alt_text': alt_text, 'page': data.get('page')}],
+                model=generator.backend.name, prompt_version=generator.prompt_template.key, source='api'
+            )
         
         return jsonify({
             'image_url': image_url,
@@ -165,10 +317,12 @@ def generate_batch_alt_text():
     
     Expected JSON payload:
     {
+        "site_url": "https://example.framer.app",  // Optional, recorded in the result store
         "images": [
             {
                 "url": "https://example.com/image1.jpg",
-                "context": "Optional context"
+                "context": "Optional context",
+                "page": "about"  // Optional
             },
             {
                 "url": "https://example.com/image2.jpg"
@@ -176,7 +330,7 @@ def generate_batch_alt_text():
         ]
     }
     """
-    data = request.get_json()
+    data = get_json_payload()
     
     if not data or 'images' not in data:
         return jsonify({'error': 'images array is required'}), 400
@@ -189,11 +343,13 @@ def generate_batch_alt_text():
     try:
         # Get OpenAI API key from environment
         openai_key = os.environ.get('OPENAI_API_KEY')
-        if not openai_key:
+        if not openai_key and backend_requires_openai_key():
             return jsonify({'error': 'OpenAI API key not configured'}), 500
         
-        generator = AltTextGenerator(openai_key)
+        generator = AltTextGenerator(openai_key, rate_limiter=rate_limiter, backend=get_backend(openai_key))
+        duplicates = DuplicateTracker()
         results = []
+        generated = []
         
         for img_data in images_data:
             if not isinstance(img_data, dict) or 'url' not in img_data:
@@ -203,33 +359,43 @@ def generate_batch_alt_text():
             context = img_data.get('context', '')
             
             # Check cache
-            cache_key = get_cache_key(image_url)
-            if cache_key in alt_text_cache:
-                cached_data = alt_text_cache[cache_key]
-                if time.time() - cached_data['timestamp'] < 86400:
-                    results.append({
-                        'url': image_url,
-                        'alt_text': cached_data['alt_text'],
-                        'cached': True
-                    })
-                    continue
+            cache_key = get_cache_key(image_url, generator.prompt_template.key)
+            with span('cache_lookup', 'cache'):
+                cached_data = alt_text_cache.get(cache_key)
+            if cached_data and time.time() - cached_data['timestamp'] < CACHE_TTL_SECONDS:
+                results.append({
+                    'url': image_url,
+                    'alt_text': cached_data['alt_text'],
+                    'cached': True
+                })
+                continue
             
             # Generate new alt text
-            alt_text = generator.generate_alt_text(image_url, context)
+            alt_text = generator.generate_validated_alt_text(
+                analysis_image_url(image_url), context, priority=PRIORITY_BULK, duplicates=duplicates
+            )
             
-            # Cache the result
-            alt_text_cache[cache_key] = {
-                'alt_text': alt_text,
-                'timestamp': time.time()
-            }
+            # Cache the result; failures are not cached so they are retried
+            if alt_text:
+                alt_text_cache[cache_key] = {
+                    'alt_text': alt_text,
+                    'timestamp': time.time()
+                }
             
             results.append({
                 'url': image_url,
                 'alt_text': alt_text,
                 'cached': False
             })
+            generated.append({'url': image_url, 'alt_text': alt_text, 'page': img_data.get('page')})
         
-        return jsonify({
+        if result_store and generated:
+            result_store.record(
+                data.get('site_url'), generated, model=generator.backend.name,
+                prompt_version=generator.prompt_template.key, source='api'
+            )
+        
+        return api_response({
             'results': results,
             'total_processed': len(results)
         })
@@ -239,18 +405,217 @@ def generate_batch_alt_text():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/diff', methods=['POST'])
+@require_api_key
+def diff_results():
+    """
+    Return only the generated alt text that differs from what is on the site
+    
+    The site is analyzed again (cached pages are revalidated with their ETag)
+    and compared with the given results by canonical image URL, so clients can
+    apply a minimal changeset in one pass.
+    
+    Expected JSON payload:
+    {
+        "site_url": "https://example.framer.app",
+        "pages": ["", "about"],  // Optional, defaults to homepage only
+        "overwrite": false,  // Optional, also replace alt text already on the site
+        "results": [
+            {"url": "https://example.com/image1.jpg", "alt_text": "Generated alt text"}
+        ]
+    }
+    """
+    data = get_json_payload()
+    
+    if not data or 'site_url' not in data:
+        return jsonify({'error': 'site_url is required'}), 400
+    
+    results = data.get('results')
+    if not isinstance(results, list):
+        return jsonify({'error': 'results must be an array'}), 400
+    
+    site_url = data['site_url']
+    pages = data.get('pages', [''])
+    
+    try:
+        analyzer = FramerSiteAnalyzer(
+            site_url,
+            page_cache=page_cache,
+            max_workers=int(os.environ.get('ANALYZE_WORKERS', '8'))
+        )
+        site_images = analyzer.find_images(pages, revalidate=True)
+        diff = diff_alt_text_results(
+            site_images, [r for r in results if isinstance(r, dict)],
+            overwrite=bool(data.get('overwrite', False))
+        )
+        
+        return api_response({
+            'site_url': site_url,
+            'pages_analyzed': pages,
+            'changes': diff['changes'],
+            'unchanged': diff['unchanged'],
+            'kept': diff['kept'],
+            'not_on_site': diff['not_on_site'],
+            'skip_urls': diff['skip_urls'],
+            'total_changes': len(diff['changes'])
+        })
+        
+    except Exception as e:
+        logger.error(f"Error computing diff: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+def _page_arguments():
+    """Read limit and cursor query parameters"""
+    limit = request.args.get('limit', default=50, type=int)
+    cursor = request.args.get('cursor', type=int)
+    return limit, cursor
+
+
+@app.route('/results', methods=['GET'])
+@require_api_key
+def list_results():
+    """
+    Search the history of generated alt text, newest first
+    
+    Query parameters (all optional):
+        site_url, page, image_url, asset_id, model, prompt_version, source: Exact-match filters
+        limit: Page size (default 50, at most 500)
+        cursor: next_cursor from the previous page
+    """
+    if not result_store:
+        return jsonify({'error': 'Result store is disabled'}), 503
+    
+    limit, cursor = _page_arguments()
+    filters = {
+        key: request.args[key]
+        for key in ('site_url', 'page', 'image_url', 'asset_id', 'model', 'prompt_version', 'source')
+        if key in request.args
+    }
+    
+    try:
+        records, next_cursor = result_store.query(limit=limit, cursor=cursor, **filters)
+        return api_response({'results': records, 'next_cursor': next_cursor})
+    except Exception as e:
+        logger.error(f"Error querying results: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/results/latest', methods=['GET'])
+@require_api_key
+def latest_results():
+    """
+    Most recent alt text for each image of a site, newest first
+    
+    Query parameters:
+        site_url: Site to load (required)
+        prompt_version: Only results generated with this prompt version
+        limit: Page size (default 50, at most 500)
+        cursor: next_cursor from the previous page
+    """
+    if not result_store:
+        return jsonify({'error': 'Result store is disabled'}), 503
+    
+    site_url = request.args.get('site_url')
+    if not site_url:
+        return jsonify({'error': 'site_url is required'}), 400
+    
+    limit, cursor = _page_arguments()
+    
+    try:
+        records, next_cursor = result_store.latest_for_site(
+            site_url, prompt_version=request.args.get('prompt_version'), limit=limit, cursor=cursor
+        )
+        return api_response({'site_url': site_url, 'results': records, 'next_cursor': next_cursor})
+    except Exception as e:
+        logger.error(f"Error loading results: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/results/sites', methods=['GET'])
+@require_api_key
+def result_sites():
+    """Sites with stored results"""
+    if not result_store:
+        return jsonify({'error': 'Result store is disabled'}), 503
+    return jsonify({'sites': result_store.sites()})
+
+
+@app.route('/cache/stats', methods=['GET'])
+@require_api_key
+def cache_stats():
+    """Number of cached alt texts, and how many are still fresh"""
+    now = time.time()
+    entries = list(alt_text_cache.values())
+    return jsonify({
+        'entries': len(entries),
+        'fresh': sum(1 for entry in entries if is_fresh(entry, now)),
+        'prompt_version': get_template().key
+    })
+
+
+@app.route('/cache/export', methods=['GET'])
+@require_api_key
+def export_cache():
+    """
+    Download the fresh cache entries as NDJSON
+    
+    Each line is {"key": ..., "alt_text": ..., "timestamp": ...}; the response
+    is compressed when the client accepts gzip or brotli.
+    """
+    out = io.StringIO()
+    count = dump_snapshot(alt_text_cache, out)
+    response = Response(out.getvalue(), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = 'attachment; filename="alt_text_cache.ndjson"'
+    response.headers['X-Cache-Entries'] = str(count)
+    return response
+
+
+@app.route('/cache/import', methods=['POST'])
+@require_api_key
+def import_cache():
+    """
+    Load cache entries from an uploaded snapshot or results file
+    
+    The body is an NDJSON snapshot from /cache/export or an
+    alt_text_results.json document, optionally sent with Content-Encoding
+    gzip or deflate. Imported entries replace cached ones with the same key.
+    """
+    try:
+        body = wire_format.decompress(
+            request.get_data(), request.headers.get('Content-Encoding'), MAX_REQUEST_BYTES
+        )
+        entries = parse_cache_content(body.decode('utf-8'))
+    except wire_format.PayloadTooLarge:
+        raise RequestEntityTooLarge()
+    except ValueError as e:
+        return jsonify({'error': f'Invalid cache file: {str(e)}'}), 400
+    
+    alt_text_cache.update(entries)
+    logger.info(f"Imported {len(entries)} cached alt texts")
+    return jsonify({'imported': len(entries), 'entries': len(alt_text_cache)})
+
+
 @app.route('/clear-cache', methods=['POST'])
 @require_api_key
 def clear_cache():
-    """Clear the alt text cache"""
+    """Clear the alt text cache and the parsed page cache"""
     global alt_text_cache
     alt_text_cache = {}
+    page_cache.clear()
     return jsonify({'message': 'Cache cleared successfully'})
 
 
-if __name__ == '__main__':
+def run_server(port: Optional[int] = None, debug: bool = True):
+    """
+    Run the Flask development server
+    
+    Args:
+        port: Port to listen on (defaults to PORT or 5000)
+        debug: Enable Flask debug mode
+    """
     # Check for required environment variables
-    if not os.environ.get('OPENAI_API_KEY'):
+    if not os.environ.get('OPENAI_API_KEY') and backend_requires_openai_key():
         logger.warning("OPENAI_API_KEY not set. API will not be able to generate alt text.")
     
     # Set default API key for development
@@ -259,5 +624,9 @@ if __name__ == '__main__':
         logger.warning("Using default development API key. Set API_KEY environment variable for production.")
     
     # Run the Flask app
-    port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    port = port or int(os.environ.get('PORT', 5000))
+    app.run(host='0.0.0.0', port=port, debug=debug)
+
+
+if __name__ == '__main__':
+    run_server()
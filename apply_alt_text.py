@@ -5,25 +5,136 @@ This script automates the process of applying alt text through the Framer editor
 """
 
 import os
+import sys
 import json
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.common.exceptions import SessionNotCreatedException
 from dotenv import load_dotenv
+from image_urls import canonical_image_url
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Where the resolved ChromeDriver path is remembered between runs
+DRIVER_PATH_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "alt-text-images", "chromedriver_path")
+
+# Walks the editor DOM once and maps every data-id node to the image URLs it
+# renders; images are attributed to their closest data-id ancestor. Nodes
+# whose image already has alt text are listed as labelled
+ELEMENT_INDEX_SCRIPT = """
+const nodes = {};
+const labelled = new Set();
+const owner = el => el.closest('[data-id]');
+const add = (el, url) => {
+    const node = owner(el);
+    if (!node || !url) return;
+    const id = node.getAttribute('data-id');
+    (nodes[id] = nodes[id] || []).push(url);
+};
+document.querySelectorAll('[data-id]').forEach(el => {
+    nodes[el.getAttribute('data-id')] = nodes[el.getAttribute('data-id')] || [];
+});
+document.querySelectorAll('img').forEach(img => {
+    add(img, img.currentSrc || img.src);
+    (img.getAttribute('srcset') || '').split(',').forEach(c => add(img, c.trim().split(/\\s+/)[0]));
+    const node = owner(img);
+    if (node && (img.getAttribute('alt') || '').trim()) labelled.add(node.getAttribute('data-id'));
+});
+document.querySelectorAll('[style*="background-image"]').forEach(el => {
+    const match = /url\\(["']?([^"')]+)["']?\\)/.exec(el.style.backgroundImage);
+    if (match) add(el, new URL(match[1], document.baseURI).href);
+});
+return {nodes: nodes, labelled: Array.from(labelled)};
+"""
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def get_driver_path() -> str:
+    """
+    Resolve the ChromeDriver binary, downloading it at most once
+    
+    Uses CHROMEDRIVER_PATH when set, then the path cached by a previous run,
+    and only falls back to webdriver-manager when neither exists.
+    
+    Returns:
+        Path to the ChromeDriver executable
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path and os.path.exists(_driver_path):
+            return _driver_path
+        
+        path = os.environ.get("CHROMEDRIVER_PATH")
+        if not path and os.path.exists(DRIVER_PATH_CACHE):
+            with open(DRIVER_PATH_CACHE, 'r') as f:
+                path = f.read().strip()
+        
+        if not path or not os.path.exists(path):
+            # Imported here since a cached path makes it unnecessary
+            from webdriver_manager.chrome import ChromeDriverManager
+            
+            logger.info("Resolving ChromeDriver with webdriver-manager...")
+            path = ChromeDriverManager().install()
+            try:
+                os.makedirs(os.path.dirname(DRIVER_PATH_CACHE), exist_ok=True)
+                with open(DRIVER_PATH_CACHE, 'w') as f:
+                    f.write(path)
+            except OSError as e:
+                logger.debug(f"Could not cache ChromeDriver path: {str(e)}")
+        
+        _driver_path = path
+        return path
+
+
+def invalidate_driver_path(path: str):
+    """
+    Forget a ChromeDriver path that no longer works, e.g. after a Chrome update
+    
+    The next get_driver_path() call resolves the driver again with
+    webdriver-manager. Paths already replaced by another thread are left alone.
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path == path:
+            _driver_path = None
+        try:
+            with open(DRIVER_PATH_CACHE, 'r') as f:
+                cached = f.read().strip()
+            if cached == path:
+                os.remove(DRIVER_PATH_CACHE)
+        except OSError:
+            pass
+
+
+def applier_options_from_env() -> Dict:
+    """Read FramerAltTextApplier keyword options from environment variables"""
+    return {
+        "explicit_waits": os.environ.get("APPLY_EXPLICIT_WAITS", "false").lower() == "true",
+        "profile_dir": os.environ.get("FRAMER_PROFILE_DIR") or None,
+        "headless": os.environ.get("FRAMER_HEADLESS", "false").lower() == "true",
+        "use_element_index": os.environ.get("APPLY_USE_INDEX", "false").lower() == "true"
+    }
+
+
 class FramerAltTextApplier:
     """Applies alt text to Framer site using browser automation"""
     
-    def __init__(self, framer_email: str, framer_password: str = None, use_google_login: bool = False):
+    def __init__(self, framer_email: str, framer_password: str = None, use_google_login: bool = False,
+                 explicit_waits: bool = False, wait_timeout: float = 10,
+                 profile_dir: Optional[str] = None, headless: bool = False,
+                 use_element_index: bool = False):
         """
         Initialize the applier with Framer credentials
         
@@ -31,26 +142,80 @@ class FramerAltTextApplier:
             framer_email: Email for Framer account
             framer_password: Password for Framer account (optional if using Google login)
             use_google_login: Whether to use Google OAuth login
+            explicit_waits: Wait for editor elements to become ready instead of
+                sleeping for fixed delays between steps
+            wait_timeout: Seconds to wait for an editor element before failing
+            profile_dir: Persistent Chrome profile directory; the Framer login is
+                kept there and reused by later runs
+            headless: Run Chrome without a visible window
+            use_element_index: Index the editor's layer tree once and select
+                nodes through it instead of searching for every image
         """
         self.email = framer_email
         self.password = framer_password
         self.use_google_login = use_google_login
+        self.explicit_waits = explicit_waits
+        self.wait_timeout = wait_timeout
+        self.profile_dir = profile_dir
+        self.headless = headless
+        self.use_element_index = use_element_index
         self.driver = None
+        self.editor_url = None
+        # Extra drivers kept warm between parallel apply runs
+        self._worker_drivers = []
         
-    def setup_driver(self):
-        """Setup Chrome driver with appropriate options"""
+    def _create_driver(self, use_profile: bool = True):
+        """
+        Create a Chrome driver with appropriate options
+        
+        Args:
+            use_profile: Open the persistent profile; only one browser can use
+                a profile directory at a time, so worker drivers pass False
+        """
         options = webdriver.ChromeOptions()
         options.add_argument('--disable-blink-features=AutomationControlled')
         options.add_experimental_option("excludeSwitches", ["enable-automation"])
         options.add_experimental_option('useAutomationExtension', False)
         
-        # Use webdriver-manager to automatically download and manage ChromeDriver
-        service = Service(ChromeDriverManager().install())
-        self.driver = webdriver.Chrome(service=service, options=options)
-        self.driver.maximize_window()
+        if use_profile and self.profile_dir:
+            options.add_argument(f'--user-data-dir={os.path.abspath(self.profile_dir)}')
+        if self.headless:
+            options.add_argument('--headless=new')
+            options.add_argument('--window-size=1920,1080')
+        
+        driver_path = get_driver_path()
+        try:
+            driver = webdriver.Chrome(service=Service(driver_path), options=options)
+        except SessionNotCreatedException:
+            if os.environ.get("CHROMEDRIVER_PATH"):
+                raise
+            # A cached driver stops matching the browser after a Chrome update
+            logger.warning("ChromeDriver does not match the installed Chrome, resolving it again...")
+            invalidate_driver_path(driver_path)
+            driver = webdriver.Chrome(service=Service(get_driver_path()), options=options)
+        if not self.headless:
+            driver.maximize_window()
+        return driver
+        
+    def setup_driver(self):
+        """Setup Chrome driver with appropriate options"""
+        self.driver = self._create_driver()
+        
+    def is_logged_in(self) -> bool:
+        """Whether the browser already has a Framer session, e.g. from a persistent profile"""
+        self.driver.get("https://framer.com/projects")
+        try:
+            self._wait_for_page_load(self.driver)
+        except Exception:
+            return False
+        return "login" not in self.driver.current_url
         
     def login_to_framer(self):
         """Login to Framer account"""
+        if self.profile_dir and self.is_logged_in():
+            logger.info("Reusing Framer session from browser profile")
+            return
+        
         logger.info("Logging into Framer...")
         self.driver.get("https://framer.com/login")
         
@@ -132,8 +297,8 @@ class FramerAltTextApplier:
             
             password_input.send_keys(Keys.RETURN)
             
-            # Wait for dashboard to load
-            time.sleep(5)
+            # Wait for the redirect away from the login page
+            WebDriverWait(self.driver, 30).until(lambda d: "login" not in d.current_url)
             logger.info("Successfully logged into Framer")
         
     def open_project(self, project_url: str):
@@ -153,44 +318,112 @@ class FramerAltTextApplier:
         else:
             editor_url = project_url
             
+        self.editor_url = editor_url
         self.driver.get(editor_url)
-        time.sleep(5)
+        if self.explicit_waits:
+            self._wait_for_page_load(self.driver)
+        else:
+            time.sleep(5)
+        
+    def _wait_for_page_load(self, driver):
+        """Wait until the current document has finished loading"""
+        WebDriverWait(driver, self.wait_timeout * 3).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+        )
         
-    def apply_alt_text_to_image(self, element_id: str, alt_text: str):
+    def build_element_index(self, driver=None) -> Dict[str, List[str]]:
+        """
+        Walk the editor's layer tree once and map images to editor nodes
+        
+        Alt text belongs to each node, so an asset used in several places
+        (a logo, a repeated card image) maps to every node that shows it.
+        
+        Args:
+            driver: Driver to use (defaults to the main driver)
+            
+        Returns:
+            Dictionary mapping each data-id to itself and each canonical image
+            URL to the data-ids of the nodes that show it and have no alt text yet
+        """
+        driver = driver or self.driver
+        raw_index = driver.execute_script(ELEMENT_INDEX_SCRIPT) or {}
+        nodes = raw_index.get('nodes', {})
+        labelled = set(raw_index.get('labelled', []))
+        
+        index: Dict[str, List[str]] = {}
+        for data_id in nodes:
+            index[data_id] = [data_id]
+        assets = 0
+        for data_id, urls in nodes.items():
+            for asset_id in dict.fromkeys(canonical_image_url(url) for url in urls):
+                if asset_id not in index:
+                    index[asset_id] = []
+                    assets += 1
+                if data_id not in labelled:
+                    index[asset_id].append(data_id)
+        
+        logger.info(f"Indexed {len(nodes)} editor nodes ({assets} image assets, {len(labelled)} already labelled)")
+        return index
+        
+    def apply_alt_text_to_image(self, element_id: str, alt_text: str, driver=None, use_search: bool = True):
         """
         Apply alt text to a specific image element
         
         Args:
             element_id: ID of the image element
             alt_text: Alt text to apply
+            driver: Driver to use (defaults to the main driver)
+            use_search: Type the ID into the editor search box first; not needed
+                when element_id is an exact data-id from build_element_index()
         """
+        driver = driver or self.driver
+        if use_search:
+            element_locator = (By.XPATH, f"//*[contains(@data-id, '{element_id}')]")
+        else:
+            element_locator = (By.CSS_SELECTOR, f'[data-id="{element_id}"]')
+        properties_locator = (By.XPATH, "//button[contains(@aria-label, 'Properties')]")
+        alt_text_locator = (By.XPATH, "//input[@placeholder='Alt Text' or @aria-label='Alt Text']")
+        
         try:
-            wait = WebDriverWait(self.driver, 10)
+            wait = WebDriverWait(driver, self.wait_timeout)
             
-            # Search for the element in the layers panel or canvas
-            search_box = wait.until(EC.presence_of_element_located((By.CLASS_NAME, "search-input")))
-            search_box.clear()
-            search_box.send_keys(element_id)
-            time.sleep(2)
-            
-            # Click on the element to select it
-            element = self.driver.find_element(By.XPATH, f"//*[contains(@data-id, '{element_id}')]")
-            element.click()
-            time.sleep(1)
-            
-            # Open properties panel if not open
-            properties_button = self.driver.find_element(By.XPATH, "//button[contains(@aria-label, 'Properties')]")
-            properties_button.click()
-            time.sleep(1)
+            if use_search:
+                # Search for the element in the layers panel or canvas
+                search_box = wait.until(EC.presence_of_element_located((By.CLASS_NAME, "search-input")))
+                search_box.clear()
+                search_box.send_keys(element_id)
             
-            # Find and fill alt text field
-            alt_text_field = self.driver.find_element(By.XPATH, "//input[@placeholder='Alt Text' or @aria-label='Alt Text']")
-            alt_text_field.clear()
-            alt_text_field.send_keys(alt_text)
-            
-            # Save changes
-            alt_text_field.send_keys(Keys.RETURN)
-            time.sleep(1)
+            if self.explicit_waits:
+                # Proceed as soon as each step's target is ready
+                wait.until(EC.element_to_be_clickable(element_locator)).click()
+                wait.until(EC.element_to_be_clickable(properties_locator)).click()
+                alt_text_field = wait.until(EC.visibility_of_element_located(alt_text_locator))
+                alt_text_field.clear()
+                alt_text_field.send_keys(alt_text)
+                alt_text_field.send_keys(Keys.RETURN)
+                wait.until(EC.text_to_be_present_in_element_value(alt_text_locator, alt_text))
+            else:
+                if use_search:
+                    time.sleep(2)
+                
+                # Click on the element to select it
+                element = driver.find_element(*element_locator)
+                element.click()
+                time.sleep(1)
+                
+                # Open properties panel if not open
+                properties_button = driver.find_element(*properties_locator)
+                properties_button.click()
+                time.sleep(1)
+                
+                # Find and fill alt text field
+                alt_text_field = driver.find_element(*alt_text_locator)
+                alt_text_field.clear()
+                alt_text_field.send_keys(alt_text)
+                
+                # Save changes
+                alt_text_field.send_keys(Keys.RETURN)
+                time.sleep(1)
             
             logger.info(f"Applied alt text to element {element_id}")
             return True
@@ -199,12 +432,78 @@ class FramerAltTextApplier:
             logger.error(f"Failed to apply alt text to {element_id}: {str(e)}")
             return False
             
-    def apply_alt_texts_from_file(self, results_file: str = "alt_text_results.json"):
+    def _create_session_driver(self, cookies: List[Dict], current_url: str):
+        """
+        Create an extra driver that shares the main driver's logged-in session
+        
+        The extra driver receives the main driver's session cookies and opens
+        the same editor URL, so no second login is needed.
+        
+        Args:
+            cookies: Cookies read from the main driver
+            current_url: URL open in the main driver
+        """
+        driver = self._create_driver(use_profile=False)
+        try:
+            if cookies:
+                # Cookies can only be set for the domain that is currently open
+                driver.get(current_url)
+                for cookie in cookies:
+                    cookie = {key: value for key, value in cookie.items() if key != 'sameSite'}
+                    try:
+                        driver.add_cookie(cookie)
+                    except Exception as e:
+                        logger.debug(f"Could not copy cookie {cookie.get('name')}: {str(e)}")
+            
+            driver.get(self.editor_url or current_url)
+            if self.explicit_waits:
+                self._wait_for_page_load(driver)
+            else:
+                time.sleep(5)
+        except Exception:
+            driver.quit()
+            raise
+        return driver
+        
+    def _start_worker_drivers(self, count: int):
+        """
+        Start extra drivers concurrently and add those that start to the warm pool
+        
+        A driver that fails to start is logged and skipped; the apply continues
+        with the drivers that are available.
+        """
+        # Read from the main driver once, not from every starting thread
+        cookies = self.driver.get_cookies()
+        current_url = self.driver.current_url
+        
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            futures = [executor.submit(self._create_session_driver, cookies, current_url) for _ in range(count)]
+            for future in as_completed(futures):
+                try:
+                    self._worker_drivers.append(future.result())
+                except Exception as e:
+                    logger.warning(f"Could not start an extra browser driver: {str(e)}")
+        
+    def _apply_items(self, items: List[Dict], driver=None) -> int:
+        """Apply a list of results sequentially with one driver; returns the success count"""
+        successful = 0
+        for item in items:
+            if self.apply_alt_text_to_image(item['element_id'], item['alt_text'], driver=driver,
+                                            use_search=not item.get('indexed')):
+                successful += 1
+        return successful
+            
+    def apply_alt_texts_from_file(self, results_file: str = "alt_text_results.json", workers: int = 1):
         """
         Apply alt texts from a results file
         
         Args:
             results_file: Path to JSON file with alt text results
+            workers: Number of browser drivers applying results in parallel;
+                extra drivers share the main driver's logged-in session
+                
+        Returns:
+            Number of alt texts applied
         """
         # Load results
         with open(results_file, 'r') as f:
@@ -212,20 +511,62 @@ class FramerAltTextApplier:
             
         results = data.get('results', [])
         
-        successful = 0
-        failed = 0
+        index = self.build_element_index() if self.use_element_index else None
         
+        items = []
+        unmatched = 0
+        # Editor nodes that already received a result in this run
+        targeted = set()
         for item in results:
             element_id = item.get('element_id')
-            alt_text = item.get('alt_text')
+            alt_text = item.get('generated_alt_text') or item.get('alt_text')
+            if not alt_text:
+                continue
             
-            if element_id and alt_text:
-                if self.apply_alt_text_to_image(element_id, alt_text):
-                    successful += 1
-                else:
-                    failed += 1
-                    
+            if index is not None:
+                # Apply to the result's own node and to every other node that
+                # shows the same asset without alt text; this also covers
+                # results without an element ID
+                asset_id = item.get('asset_id') or canonical_image_url(item.get('url', ''))
+                matched = (index.get(element_id) or []) + index.get(asset_id, [])
+                if element_id in index or asset_id in index:
+                    for data_id in dict.fromkeys(matched):
+                        if data_id not in targeted:
+                            targeted.add(data_id)
+                            items.append({'element_id': data_id, 'alt_text': alt_text, 'indexed': True})
+                    continue
+                unmatched += 1
+            
+            if element_id:
+                items.append({'element_id': element_id, 'alt_text': alt_text})
+        
+        if unmatched:
+            logger.warning(f"{unmatched} results did not match any indexed editor node")
+        
+        workers = max(1, min(workers, len(items)))
+        if workers == 1:
+            successful = self._apply_items(items)
+        else:
+            missing = workers - 1 - len(self._worker_drivers)
+            if missing > 0:
+                self._start_worker_drivers(missing)
+            else:
+                logger.info("Reusing warm browser drivers from a previous run")
+            drivers = [self.driver] + self._worker_drivers[:workers - 1]
+            workers = len(drivers)
+            logger.info(f"Applying {len(items)} alt texts with {workers} browser drivers...")
+            
+            # Each driver works through its own share of the results
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                counts = executor.map(
+                    lambda index: self._apply_items(items[index::workers], driver=drivers[index]),
+                    range(workers)
+                )
+                successful = sum(counts)
+        
+        failed = len(items) - successful
         logger.info(f"Applied alt text to {successful} images, {failed} failed")
+        return successful
         
     def publish_changes(self):
         """Publish the changes to the live site"""
@@ -248,13 +589,21 @@ class FramerAltTextApplier:
             logger.error(f"Failed to publish changes: {str(e)}")
             
     def cleanup(self):
-        """Close the browser"""
+        """Close the browser and any warm worker drivers"""
+        for driver in self._worker_drivers:
+            driver.quit()
+        self._worker_drivers = []
         if self.driver:
             self.driver.quit()
             
 
-def main():
-    """Main function to apply alt text to Framer site"""
+def main() -> int:
+    """
+    Main function to apply alt text to Framer site
+    
+    Returns:
+        Exit status: 0 on success, 1 on a configuration error
+    """
     
     # Load environment variables
     load_dotenv()
@@ -271,31 +620,31 @@ def main():
         logger.info("FRAMER_EMAIL=your-email@example.com")
         logger.info("USE_GOOGLE_LOGIN=true  # If using Google login")
         logger.info("FRAMER_PROJECT_URL=https://your-project.framer.app")
-        return
+        return 1
         
     if not use_google_login and not framer_password:
         logger.error("FRAMER_PASSWORD is required when not using Google login")
         logger.info("Either set FRAMER_PASSWORD or set USE_GOOGLE_LOGIN=true in your .env file")
-        return
+        return 1
         
     if not framer_project_url:
         logger.error("FRAMER_PROJECT_URL environment variable is required")
-        return
+        return 1
         
     # Check if results file exists
     results_file = "alt_text_results.json"
     if not os.path.exists(results_file):
         logger.error(f"Results file {results_file} not found. Run alt_text_generator.py first.")
-        return
+        return 1
         
     # Apply alt texts
-    applier = FramerAltTextApplier(framer_email, framer_password, use_google_login)
+    applier = FramerAltTextApplier(framer_email, framer_password, use_google_login, **applier_options_from_env())
     
     try:
         applier.setup_driver()
         applier.login_to_framer()
         applier.open_project(framer_project_url)
-        applier.apply_alt_texts_from_file(results_file)
+        applier.apply_alt_texts_from_file(results_file, workers=int(os.environ.get("APPLY_WORKERS", "1")))
         
         # Ask user if they want to publish
         response = input("\nDo you want to publish the changes? (y/n): ")
@@ -304,7 +653,9 @@ def main():
             
     finally:
         applier.cleanup()
+    
+    return 0
         
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -8,7 +8,8 @@ import json
 import time
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from apply_alt_text import get_driver_path
+from validation import clean_alt_text, validate_alt_text
 from dotenv import load_dotenv
 import logging
 
@@ -40,7 +41,7 @@ def main():
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
     
-    service = Service(ChromeDriverManager().install())
+    service = Service(get_driver_path())
     driver = webdriver.Chrome(service=service, options=options)
     driver.maximize_window()
     
@@ -64,8 +65,8 @@ def main():
     
     valid_results = []
     for result in data['results']:
-        alt_text = result.get('generated_alt_text', '').strip()
-        if alt_text and not alt_text.startswith("Please") and not alt_text.startswith("I'm unable"):
+        alt_text = clean_alt_text(result.get('generated_alt_text', ''))
+        if not validate_alt_text(alt_text):
             valid_results.append(result)
             logger.info(f"Image: {result['url'][:50]}...")
             logger.info(f"Alt text: {alt_text[:100]}...")
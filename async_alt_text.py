@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Async alt text generation
+AsyncAltTextGenerator runs many generations in one event loop without a thread per request
+"""
+
+import time
+import asyncio
+import inspect
+import logging
+import functools
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from alt_text_generator import (
+    GenerationSteps, ImageInfo, PrioritySlots, get_cache_key, CACHE_TTL_SECONDS, PRIORITY_BULK
+)
+from image_urls import canonical_image_url
+from prefilter import prefilter_images_async, GENERATE, DECORATIVE
+from prompts import PromptTemplate, get_template
+from validation import DuplicateTracker
+from vision_backends import VisionBackend, AsyncOpenAIBackend, DEFAULT_OPENAI_MODEL
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncPriorityRateLimiter(PrioritySlots):
+    """
+    Async version of PriorityRateLimiter
+
+    Slots are spaced at least ``min_interval`` seconds apart and waiting
+    coroutines are served lowest priority value first (FIFO within a lane).
+    A cancelled waiter gives up its place in the queue.
+    """
+
+    def __init__(self, min_interval: float = 1.0):
+        """
+        Args:
+            min_interval: Minimum delay in seconds between two API calls
+        """
+        super().__init__(min_interval)
+        self._cond: Optional[asyncio.Condition] = None  # Created inside the running loop
+
+    async def acquire(self, priority: int = PRIORITY_BULK) -> float:
+        """
+        Wait until the caller may make an API call
+
+        Args:
+            priority: Lane of the caller (PRIORITY_INTERACTIVE or PRIORITY_BULK)
+
+        Returns:
+            Seconds spent waiting for the slot
+        """
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        cond = self._cond
+        started = time.monotonic()
+
+        async with cond:
+            ticket = self._enqueue(priority)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._take_slot(ticket, now)
+                    if wait == 0:
+                        cond.notify_all()
+                        return now - started
+                    # Wakes early if a higher priority caller arrives; None waits for a notify
+                    try:
+                        await asyncio.wait_for(cond.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                self._withdraw(ticket)
+                cond.notify_all()
+                raise
+
+    def pending(self, priority: Optional[int] = None) -> int:
+        """Number of callers waiting, optionally restricted to one lane"""
+        return self._count_pending(priority)
+
+
+class AsyncAltTextGenerator(GenerationSteps):
+    """
+    Async counterpart of AltTextGenerator
+
+    Rate limiting and backoff use asyncio.sleep and the default backend is
+    AsyncOpenAIBackend, so thousands of generations can be in flight in one
+    process. Blocking backends (such as the local captioning model) are run
+    in the loop's default executor.
+
+    Cancelling a task cancels its API call and frees its rate limit slot;
+    closing or cancelling iter_batch_alt_text cancels all its pending work.
+    """
+
+    def __init__(self, openai_api_key: Optional[str] = None, rate_limit_delay: float = 1.0,
+                 rate_limiter: Optional[AsyncPriorityRateLimiter] = None,
+                 backend: Optional[VisionBackend] = None, model: str = DEFAULT_OPENAI_MODEL,
+                 prompt_template: Optional[PromptTemplate] = None, max_regenerations: int = 2,
+                 cache: Optional[Dict[str, Dict]] = None, max_concurrency: int = 100):
+        """
+        Args:
+            openai_api_key: OpenAI API key for Vision API access
+            rate_limit_delay: Delay in seconds between API calls to avoid rate limits
+            rate_limiter: Shared limiter to use instead of a private one
+            backend: Vision backend to use instead of the async OpenAI API
+            model: OpenAI model used when no backend is given
+            prompt_template: Prompt template (defaults to PROMPT_TEMPLATE or the built-in one)
+            max_regenerations: How often rejected alt text is regenerated with an
+                adjusted prompt before the image counts as failed; ignored for
+                backends that do not follow instructions, such as local captioning
+            cache: Dictionary of {cache key: {'alt_text', 'timestamp'}} entries, in the
+                same format as the API server's alt_text_cache; None disables caching
+            max_concurrency: Maximum number of images a batch generates at once
+        """
+        self.backend = backend or AsyncOpenAIBackend(openai_api_key, model)
+        # A backend passed in by the caller may be shared, so only our own is closed
+        self._owns_backend = backend is None
+        self.prompt_template = prompt_template or get_template()
+        # Regenerating only helps when the backend reads the correction hint
+        self.max_regenerations = max_regenerations if getattr(self.backend, 'follows_instructions', True) else 0
+        self.rate_limiter = rate_limiter or AsyncPriorityRateLimiter(rate_limit_delay)
+        self.rate_limit_delay = self.rate_limiter.min_interval
+        self.cache = cache
+        self.max_concurrency = max(1, max_concurrency)
+        self._http_client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the pre-filter's connection pool, and the backend's if this generator created it"""
+        if self._owns_backend and hasattr(self.backend, "aclose"):
+            await self.backend.aclose()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    def _get_http_client(self):
+        """HTTP client for pre-filter probes, created on first use"""
+        if self._http_client is None:
+            import httpx
+
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_concurrency),
+                headers={'User-Agent': 'Mozilla/5.0 (compatible; AltTextBot/1.0)'}
+            )
+        return self._http_client
+
+    def _cached_alt_text(self, image_url: str) -> Optional[str]:
+        """Cached alt text for an image that is younger than CACHE_TTL_SECONDS"""
+        if self.cache is None:
+            return None
+        entry = self.cache.get(get_cache_key(image_url, self.prompt_template.key))
+        if entry and time.time() - entry['timestamp'] < CACHE_TTL_SECONDS:
+            return entry['alt_text']
+        return None
+
+    def _cache_alt_text(self, image_url: str, alt_text: str):
+        """Remember generated alt text; failures are not cached"""
+        if self.cache is not None and alt_text:
+            self.cache[get_cache_key(image_url, self.prompt_template.key)] = {
+                'alt_text': alt_text,
+                'timestamp': time.time()
+            }
+
+    async def _wait_for_rate_limit(self, priority: int = PRIORITY_BULK):
+        """Enforce rate limiting between API calls"""
+        waited = await self.rate_limiter.acquire(priority)
+        if waited > 0:
+            logger.debug(f"Rate limiting: waited {waited:.2f} seconds (priority {priority})")
+
+    async def _describe(self, image_url: str, instructions: str, context_text: str) -> str:
+        """Call the backend, in the default executor if it is blocking"""
+        if inspect.iscoroutinefunction(self.backend.describe):
+            return await self.backend.describe(image_url, instructions, context_text, max_tokens=300)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(
+            self.backend.describe, image_url, instructions, context_text, max_tokens=300
+        ))
+
+    async def generate_alt_text(self, image_url: str, context: Union[str, Dict[str, str]] = "",
+                                retry_count: int = 3, priority: int = PRIORITY_BULK,
+                                correction: str = "") -> Optional[str]:
+        """
+        Generate alt text for a single image with rate limiting and retries
+
+        Args:
+            image_url: URL of the image
+            context: Additional context about the image placement, as text or as
+                a dictionary of page context (see ImageInfo.context)
+            retry_count: Number of retries on rate limit errors
+            priority: Rate limit lane; PRIORITY_INTERACTIVE jumps ahead of bulk work
+            correction: Hint about why a previous answer was rejected
+
+        Returns:
+            Generated alt text (possibly empty), or None if the backend call
+            failed or stayed rate limited after every retry
+        """
+        instructions, context_text = self._prompt(context, correction)
+
+        await self._wait_for_rate_limit(priority)
+
+        for attempt in range(retry_count):
+            try:
+                alt_text = await self._describe(image_url, instructions, context_text)
+                logger.info(f"Generated alt text for {image_url}: {alt_text}")
+                return alt_text
+
+            except Exception as e:
+                backoff_time = self._retry_delay(e, image_url, attempt, retry_count)
+                if backoff_time is None:
+                    return None
+                await asyncio.sleep(backoff_time)
+                # Queue again so retries do not jump ahead of other lanes
+                await self._wait_for_rate_limit(priority)
+
+        return None
+
+    async def generate_validated_alt_text(self, image_url: str, context: Union[str, Dict[str, str]] = "",
+                                          priority: int = PRIORITY_BULK,
+                                          duplicates: Optional[DuplicateTracker] = None) -> str:
+        """
+        Generate alt text, served from the cache when possible, and regenerate it
+        while it fails validation
+
+        Args:
+            image_url: URL of the image
+            context: Additional context about the image placement
+            priority: Rate limit lane
+            duplicates: Tracker of alt text already used for other images
+
+        Returns:
+            Valid alt text, or "" if the backend failed or every attempt was rejected
+        """
+        cached = self._cached_alt_text(image_url)
+        if cached:
+            logger.info(f"Returning cached alt text for {image_url}")
+            if duplicates:
+                duplicates.add(cached, canonical_image_url(image_url))
+            return cached
+
+        correction = ""
+        for attempt in range(self.max_regenerations + 1):
+            alt_text, correction = self._review_alt_text(
+                image_url, await self.generate_alt_text(image_url, context, priority=priority, correction=correction),
+                attempt, duplicates
+            )
+            if alt_text:
+                self._cache_alt_text(image_url, alt_text)
+                return alt_text
+            if not correction:
+                break
+        return ""
+
+    async def iter_batch_alt_text(self, images: List[ImageInfo], batch_size: int = 0,
+                                  prefilter: bool = True) -> AsyncIterator[Tuple[ImageInfo, str]]:
+        """
+        Generate alt text for multiple images, yielding results as they complete
+
+        Size variants of the same asset share one generation and are yielded
+        together. Decorative images are yielded first with "" and marked
+        decorative; non-content images are left out.
+
+        Args:
+            images: List of ImageInfo objects
+            batch_size: Maximum number of images to process (0 for all)
+            prefilter: Classify images before any API call
+
+        Yields:
+            (image, alt_text) for every processed image; alt_text is "" on failure
+        """
+        images_to_process = images[:batch_size] if batch_size > 0 else images
+
+        images_by_asset: Dict[str, List[ImageInfo]] = {}
+        for image in images_to_process:
+            if not image.current_alt:
+                asset_id = image.asset_id or canonical_image_url(image.url)
+                images_by_asset.setdefault(asset_id, []).append(image)
+
+        if prefilter and images_by_asset:
+            verdicts = await prefilter_images_async(
+                [img for group in images_by_asset.values() for img in group],
+                self._get_http_client(), max_concurrency=self.max_concurrency
+            )
+            for asset_id, (verdict, reason) in verdicts.items():
+                if verdict == GENERATE:
+                    continue
+                asset_images = images_by_asset.pop(asset_id)
+                logger.info(f"Pre-filter: {verdict} {asset_images[0].url} ({reason})")
+                if verdict == DECORATIVE:
+                    for image in asset_images:
+                        image.decorative = True
+                        yield image, ""
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        duplicates = DuplicateTracker()
+
+        async def generate(asset_images: List[ImageInfo]) -> str:
+            image = asset_images[0]
+            context = dict(image.context, page=image.page or "homepage") if image.page is not None else image.context
+            async with semaphore:
+                return await self.generate_validated_alt_text(
+                    image.analysis_url or image.url, context, priority=PRIORITY_BULK, duplicates=duplicates
+                )
+
+        pending = {
+            asyncio.ensure_future(generate(asset_images)): asset_images
+            for asset_images in images_by_asset.values()
+        }
+        try:
+            while pending:
+                finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    asset_images = pending.pop(task)
+                    alt_text = task.result()
+                    for image in asset_images:
+                        yield image, alt_text
+        finally:
+            # Reached when the consumer stops early or the batch is cancelled
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def generate_batch_alt_text(self, images: List[ImageInfo], batch_size: int = 0,
+                                      prefilter: bool = True) -> Dict[str, str]:
+        """
+        Generate alt text for multiple images
+
+        Args:
+            images: List of ImageInfo objects
+            batch_size: Maximum number of images to process (0 for all)
+            prefilter: Classify images before any API call
+
+        Returns:
+            Dictionary mapping image URLs to generated alt text
+        """
+        results = {}
+        successful = 0
+        async for image, alt_text in self.iter_batch_alt_text(images, batch_size, prefilter):
+            results[image.url] = alt_text
+            successful += bool(alt_text)
+        logger.info(f"Batch processing complete: {successful} successful out of {len(results)} images")
+        return results
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Alt text cache snapshots
+NDJSON export/import of the API server cache and warm-up from alt_text_results.json files
+"""
+
+import io
+import glob
+import gzip
+import json
+import time
+import logging
+from typing import Dict, IO, Iterable, List, Optional
+
+from alt_text_generator import get_cache_key, CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def _open_text(path: str, mode: str) -> IO[str]:
+    """Open a text file, gzip-compressed when the name ends in .gz"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def is_fresh(entry: Dict, now: Optional[float] = None) -> bool:
+    """Whether a cache entry is younger than CACHE_TTL_SECONDS"""
+    return (now or time.time()) - entry["timestamp"] < CACHE_TTL_SECONDS
+
+
+def dump_snapshot(cache: Dict[str, Dict], out: IO[str]) -> int:
+    """
+    Write the fresh entries of a cache as NDJSON
+
+    Each line is {"key": ..., "alt_text": ..., "timestamp": ...}.
+
+    Returns:
+        Number of entries written
+    """
+    now = time.time()
+    count = 0
+    for key, entry in list(cache.items()):
+        if entry.get("alt_text") and is_fresh(entry, now):
+            out.write(json.dumps(
+                {"key": key, "alt_text": entry["alt_text"], "timestamp": entry["timestamp"]},
+                separators=(",", ":"), ensure_ascii=False
+            ) + "\n")
+            count += 1
+    return count
+
+
+def export_snapshot(cache: Dict[str, Dict], path: str) -> int:
+    """Write a cache snapshot to a file (.ndjson, or .ndjson.gz for gzip)"""
+    with _open_text(path, "w") as f:
+        return dump_snapshot(cache, f)
+
+
+def parse_snapshot(lines: Iterable[str]) -> Dict[str, Dict]:
+    """
+    Read cache entries from NDJSON lines; malformed and expired lines are skipped
+
+    Entries keep their original timestamp, so they expire as they would have
+    in the instance they were exported from.
+    """
+    now = time.time()
+    entries = {}
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+            entry = {"alt_text": str(record["alt_text"]), "timestamp": float(record["timestamp"])}
+            key = str(record["key"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Skipping malformed snapshot line {number}")
+            continue
+        if entry["alt_text"] and is_fresh(entry, now):
+            entries[key] = entry
+    return entries
+
+
+def results_to_cache(document: Dict, timestamp: Optional[float] = None) -> Dict[str, Dict]:
+    """
+    Build cache entries from an alt_text_results.json document
+
+    Results are keyed with the document's prompt_version, so they are only
+    served while that prompt is in use. Documents written before results were
+    versioned have no prompt_version and are ignored.
+
+    Args:
+        document: Parsed results file
+        timestamp: Cache time given to the entries (default: now)
+
+    Returns:
+        Dictionary of cache entries
+    """
+    prompt_version = document.get("prompt_version")
+    if not prompt_version:
+        logger.warning(f"Results for {document.get('site_url')} have no prompt_version; not loaded into the cache")
+        return {}
+
+    timestamp = timestamp or time.time()
+    entries = {}
+    for result in document.get("results", []):
+        url = result.get("url")
+        alt_text = result.get("generated_alt_text") or result.get("alt_text")
+        if url and alt_text:
+            entries[get_cache_key(url, prompt_version)] = {"alt_text": alt_text, "timestamp": timestamp}
+    return entries
+
+
+def parse_cache_content(content: str) -> Dict[str, Dict]:
+    """
+    Read cache entries from a snapshot or a results document
+
+    Content holding a single results document ({"site_url": ..., "results":
+    [...]}) is read as alt_text_results.json, anything else as an NDJSON
+    snapshot.
+    """
+    try:
+        document = json.loads(content)
+    except ValueError:
+        document = None
+    if isinstance(document, dict) and "results" in document:
+        return results_to_cache(document)
+    return parse_snapshot(io.StringIO(content))
+
+
+def load_cache_file(path: str) -> Dict[str, Dict]:
+    """Load cache entries from a snapshot or results file, gzip-compressed if it ends in .gz"""
+    with _open_text(path, "r") as f:
+        return parse_cache_content(f.read())
+
+
+def warm_cache(patterns: str) -> Dict[str, Dict]:
+    """
+    Load cache entries from every file matching a list of patterns
+
+    Args:
+        patterns: Comma-separated paths or glob patterns (e.g.
+            "cache.ndjson.gz,results/*_alt_text_results.json")
+
+    Returns:
+        Dictionary of cache entries; later files win on conflicts
+    """
+    entries: Dict[str, Dict] = {}
+    paths: List[str] = []
+    for pattern in (p.strip() for p in patterns.split(",")):
+        if pattern:
+            paths.extend(sorted(glob.glob(pattern)) or [pattern])
+
+    for path in paths:
+        try:
+            loaded = load_cache_file(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read cache file {path}: {str(e)}")
+            continue
+        logger.info(f"Loaded {len(loaded)} cached alt texts from {path}")
+        entries.update(loaded)
+    return entries
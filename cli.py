@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Command line entry point for the Alt Text Generator
+Subcommands load their heavy dependencies only when they run
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+from typing import List, Optional
+
+# Modules measured by the import-time benchmark
+BENCHMARK_MODULES = [
+    "cli", "alt_text_generator", "vision_backends", "prefilter",
+    "api_server", "apply_alt_text", "scheduler"
+]
+
+
+def cmd_analyze(args) -> int:
+    """Print images without alt text as JSON"""
+    from dotenv import load_dotenv
+    from alt_text_generator import FramerSiteAnalyzer
+    from tracing import profiled
+
+    load_dotenv()
+    site_url = args.site_url or os.environ.get("FRAMER_SITE_URL", "")
+    if not site_url:
+        print("A site URL is required (argument or FRAMER_SITE_URL)", file=sys.stderr)
+        return 1
+
+    pages = (args.pages if args.pages is not None else os.environ.get("PAGES_TO_CHECK", "")).split(",")
+    analyzer = FramerSiteAnalyzer(site_url, max_workers=args.workers)
+    with profiled("analyze"):
+        images = analyzer.find_images_without_alt(pages)
+    print(json.dumps({
+        "site_url": site_url,
+        "pages_analyzed": pages,
+        "images_without_alt": [
+            {
+                "url": image.url,
+                "asset_id": image.asset_id,
+                "selector": image.selector,
+                "element_id": image.element_id,
+                "page": image.page
+            }
+            for image in images
+        ],
+        "total_found": len(images)
+    }, indent=2))
+    return 0
+
+
+def cmd_generate(args) -> int:
+    """Run the standalone generator configured through environment variables"""
+    import alt_text_generator
+
+    return alt_text_generator.main()
+
+
+def cmd_apply(args) -> int:
+    """Apply alt_text_results.json to the Framer project with browser automation"""
+    import apply_alt_text
+
+    return apply_alt_text.main()
+
+
+def cmd_serve(args) -> int:
+    """Run the API server"""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    import api_server
+
+    api_server.run_server(port=args.port, debug=args.debug)
+    return 0
+
+
+def cmd_schedule(args) -> int:
+    """Sweep many sites (arguments are passed to scheduler.py)"""
+    import scheduler
+
+    return scheduler.main(args.scheduler_args)
+
+
+def cmd_cache_snapshot(args) -> int:
+    """Build a cache snapshot for CACHE_WARM_FILES or POST /cache/import"""
+    from cache_snapshot import export_snapshot, warm_cache
+
+    entries = warm_cache(",".join(args.files))
+    count = export_snapshot(entries, args.output)
+    print(f"Wrote {count} cached alt texts to {args.output}")
+    return 0 if count else 1
+
+
+def measure_import_time(module: str) -> Optional[dict]:
+    """
+    Import a module in a fresh interpreter with -X importtime
+
+    Returns:
+        {"module", "total_ms", "slowest": [(name, cumulative_ms), ...]}, or
+        None if the module could not be imported
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        return None
+
+    # Lines come children first; indentation grows by two spaces per level
+    total_ms = 0.0
+    children = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|( +)(\S+)", line)
+        if not match:
+            continue
+        cumulative, indent, name = match.groups()
+        level = (len(indent) - 1) // 2
+        if level == 1:
+            children.append((name, int(cumulative) / 1000))
+        elif level == 0:
+            if name == module:
+                total_ms = int(cumulative) / 1000
+                break
+            children = []
+
+    slowest = sorted(children, key=lambda item: item[1], reverse=True)[:5]
+    return {"module": module, "total_ms": round(total_ms, 1), "slowest": slowest}
+
+
+def cmd_import_time(args) -> int:
+    """Report how long each entry module takes to import in a cold interpreter"""
+    for module in args.modules or BENCHMARK_MODULES:
+        runs = [measure_import_time(module) for _ in range(args.repeat)]
+        if any(run is None for run in runs):
+            print(f"{module:<20} import failed (missing dependency?)")
+            continue
+
+        best = min(runs, key=lambda run: run["total_ms"])
+        heaviest = ", ".join(f"{name} {ms:.1f}ms" for name, ms in best["slowest"][:3])
+        print(f"{module:<20} {best['total_ms']:>8.1f} ms   {heaviest}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser"""
+    parser = argparse.ArgumentParser(description="Alt Text Generator for Framer sites")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="Write a Chrome trace of fetch/API/cache spans (sets ALT_TEXT_TRACE)")
+    parser.add_argument("--profile-dir", metavar="DIR",
+                        help="Write cProfile dumps of each run or request (sets ALT_TEXT_PROFILE_DIR)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    analyze = subparsers.add_parser("analyze", help="Find images without alt text")
+    analyze.add_argument("site_url", nargs="?", help="Site URL (default: FRAMER_SITE_URL)")
+    analyze.add_argument("--pages", help="Comma-separated page paths (default: PAGES_TO_CHECK)")
+    analyze.add_argument("--workers", type=int, default=8, help="Pages fetched concurrently")
+    analyze.set_defaults(func=cmd_analyze)
+
+    generate = subparsers.add_parser("generate", help="Analyze the site and generate alt text")
+    generate.set_defaults(func=cmd_generate)
+
+    apply = subparsers.add_parser("apply", help="Apply generated alt text in the Framer editor")
+    apply.set_defaults(func=cmd_apply)
+
+    serve = subparsers.add_parser("serve", help="Run the API server")
+    serve.add_argument("--port", type=int, help="Port (default: PORT or 5000)")
+    serve.add_argument("--debug", action="store_true", help="Enable Flask debug mode")
+    serve.set_defaults(func=cmd_serve)
+
+    schedule = subparsers.add_parser("schedule", help="Sweep many sites from a JSON file")
+    schedule.add_argument("scheduler_args", nargs=argparse.REMAINDER, help="Arguments for scheduler.py")
+    schedule.set_defaults(func=cmd_schedule)
+
+    snapshot = subparsers.add_parser("cache-snapshot", help="Build an API server cache snapshot")
+    snapshot.add_argument("files", nargs="+", help="Results files, snapshots or glob patterns to merge")
+    snapshot.add_argument("-o", "--output", default="alt_text_cache.ndjson.gz",
+                          help="Snapshot file; .gz is gzip-compressed (default: alt_text_cache.ndjson.gz)")
+    snapshot.set_defaults(func=cmd_cache_snapshot)
+
+    import_time = subparsers.add_parser("import-time", help="Benchmark module import times")
+    import_time.add_argument("modules", nargs="*", help=f"Modules to measure (default: {', '.join(BENCHMARK_MODULES)})")
+    import_time.add_argument("--repeat", type=int, default=3, help="Runs per module; the fastest is reported")
+    import_time.set_defaults(func=cmd_import_time)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Main function to dispatch a subcommand"""
+    args = build_parser().parse_args(argv)
+    # Set through the environment so scheduler workers and the server pick them up too
+    if args.trace:
+        os.environ["ALT_TEXT_TRACE"] = args.trace
+    if args.profile_dir:
+        os.environ["ALT_TEXT_PROFILE_DIR"] = args.profile_dir
+    if os.environ.get("ALT_TEXT_TRACE") or os.environ.get("ALT_TEXT_PROFILE_DIR"):
+        from tracing import configure_tracing
+
+        # The server and the scheduler run several processes; each gets its own trace file
+        configure_tracing(per_process=args.command in ("serve", "schedule"))
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,9 +13,40 @@ interface GeneratedAltText {
     alt_text: string
 }
 
+interface StoredResult {
+    image_url: string
+    asset_id: string
+    alt_text: string
+    decorative: boolean
+}
+
+// Framer serves size variants of an asset under the same path
+const assetPath = (url: string) => url.split(/[?#]/)[0]
+
+// Rebuild records from a ?format=columns response (one array per field)
+const fromColumns = <T,>(columns: Record<string, unknown[]>): T[] => {
+    const keys = Object.keys(columns)
+    const length = keys.length ? columns[keys[0]].length : 0
+    return Array.from({ length }, (_, index) =>
+        Object.fromEntries(keys.map(key => [key, columns[key][index]])) as T
+    )
+}
+
+// JSON request body, gzip-compressed when it is large and the browser supports it
+const jsonBody = async (payload: unknown): Promise<{ body: BodyInit; headers: Record<string, string> }> => {
+    const json = JSON.stringify(payload)
+    const headers: Record<string, string> = { "Content-Type": "application/json" }
+    if (json.length < 1024 || typeof CompressionStream === "undefined") {
+        return { body: json, headers }
+    }
+    const stream = new Blob([json]).stream().pipeThrough(new CompressionStream("gzip"))
+    return { body: await new Response(stream).blob(), headers: { ...headers, "Content-Encoding": "gzip" } }
+}
+
 export function AltTextGenerator() {
     const [apiUrl, setApiUrl] = useState("http://localhost:5000")
     const [apiKey, setApiKey] = useState("")
+    const [siteUrl, setSiteUrl] = useState("")
     const [isAnalyzing, setIsAnalyzing] = useState(false)
     const [isGenerating, setIsGenerating] = useState(false)
     const [images, setImages] = useState<ImageWithoutAlt[]>([])
@@ -28,15 +59,18 @@ export function AltTextGenerator() {
     useEffect(() => {
         const savedApiUrl = localStorage.getItem("alttext_api_url")
         const savedApiKey = localStorage.getItem("alttext_api_key")
+        const savedSiteUrl = localStorage.getItem("alttext_site_url")
         
         if (savedApiUrl) setApiUrl(savedApiUrl)
         if (savedApiKey) setApiKey(savedApiKey)
+        if (savedSiteUrl) setSiteUrl(savedSiteUrl)
     }, [])
 
     // Save settings when they change
     const saveSettings = () => {
         localStorage.setItem("alttext_api_url", apiUrl)
         localStorage.setItem("alttext_api_key", apiKey)
+        localStorage.setItem("alttext_site_url", siteUrl)
         setSuccess("Settings saved successfully")
         setTimeout(() => setSuccess(null), 3000)
     }
@@ -70,7 +104,11 @@ export function AltTextGenerator() {
             if (imagesWithoutAlt.length === 0) {
                 setSuccess("All images have alt text!")
             } else {
-                setSuccess(`Found ${imagesWithoutAlt.length} images without alt text`)
+                const restored = siteUrl ? await loadPreviousResults(imagesWithoutAlt) : 0
+                setSuccess(
+                    `Found ${imagesWithoutAlt.length} images without alt text` +
+                    (restored ? ` (${restored} with previously generated alt text)` : "")
+                )
             }
         } catch (err) {
             setError(`Error analyzing page: ${err.message}`)
@@ -79,6 +117,47 @@ export function AltTextGenerator() {
         }
     }
 
+    // Prefill alt text generated in earlier sessions from the server's result store
+    const loadPreviousResults = async (pageImages: ImageWithoutAlt[]): Promise<number> => {
+        const stored = new Map<string, string>()
+        let cursor: number | null = null
+
+        try {
+            do {
+                const params = new URLSearchParams({ site_url: siteUrl, limit: "500", format: "columns" })
+                if (cursor !== null) params.set("cursor", String(cursor))
+
+                const response = await fetch(`${apiUrl}/results/latest?${params}`, {
+                    headers: { "X-API-Key": apiKey }
+                })
+                if (!response.ok) return 0
+
+                const data = await response.json()
+                for (const result of fromColumns<StoredResult>(data.results)) {
+                    if (result.alt_text && !stored.has(assetPath(result.image_url))) {
+                        stored.set(assetPath(result.image_url), result.alt_text)
+                    }
+                }
+                cursor = data.next_cursor
+            } while (cursor !== null)
+        } catch {
+            // The result store is optional; start without previous results
+            return 0
+        }
+
+        const newAltTexts = new Map(generatedAltTexts)
+        let restored = 0
+        for (const image of pageImages) {
+            const altText = stored.get(assetPath(image.url))
+            if (altText && !newAltTexts.has(image.url)) {
+                newAltTexts.set(image.url, altText)
+                restored++
+            }
+        }
+        setGeneratedAltTexts(newAltTexts)
+        return restored
+    }
+
     // Toggle image selection
     const toggleImageSelection = (url: string) => {
         const newSelection = new Set(selectedImages)
@@ -112,18 +191,17 @@ export function AltTextGenerator() {
         try {
             const imagesToProcess = images.filter(img => selectedImages.has(img.url))
             
-            const response = await fetch(`${apiUrl}/generate-batch`, {
+            const { body, headers } = await jsonBody({
+                site_url: siteUrl || undefined,
+                images: imagesToProcess.map(img => ({
+                    url: img.url,
+                    context: `Framer element ID: ${img.element_id}`
+                }))
+            })
+            const response = await fetch(`${apiUrl}/generate-batch?format=columns`, {
                 method: "POST",
-                headers: {
-                    "Content-Type": "application/json",
-                    "X-API-Key": apiKey
-                },
-                body: JSON.stringify({
-                    images: imagesToProcess.map(img => ({
-                        url: img.url,
-                        context: `Framer element ID: ${img.element_id}`
-                    }))
-                })
+                headers: { ...headers, "X-API-Key": apiKey },
+                body
             })
 
             if (!response.ok) {
@@ -131,14 +209,15 @@ export function AltTextGenerator() {
             }
 
             const data = await response.json()
+            const results = fromColumns<GeneratedAltText>(data.results)
             const newAltTexts = new Map(generatedAltTexts)
             
-            for (const result of data.results) {
+            for (const result of results) {
                 newAltTexts.set(result.url, result.alt_text)
             }
             
             setGeneratedAltTexts(newAltTexts)
-            setSuccess(`Generated alt text for ${data.results.length} images`)
+            setSuccess(`Generated alt text for ${results.length} images`)
         } catch (err) {
             setError(`Error generating alt text: ${err.message}`)
         } finally {
@@ -146,24 +225,52 @@ export function AltTextGenerator() {
         }
     }
 
+    // Ask the server which generated alt texts the published site already has
+    // (or has human-written alt text for), so they are not applied again
+    const fetchSkippedUrls = async (): Promise<Set<string>> => {
+        const { body, headers } = await jsonBody({
+            site_url: siteUrl,
+            results: Array.from(generatedAltTexts, ([url, alt_text]) => ({ url, alt_text }))
+        })
+        const response = await fetch(`${apiUrl}/diff?format=columns`, {
+            method: "POST",
+            headers: { ...headers, "X-API-Key": apiKey },
+            body
+        })
+
+        if (!response.ok) {
+            throw new Error(`API error: ${response.statusText}`)
+        }
+
+        const data = await response.json()
+        return new Set<string>(data.skip_urls)
+    }
+
     // Apply generated alt text to Framer elements
     const applyAltText = async () => {
         let appliedCount = 0
         setError(null)
 
         try {
-            for (const image of images) {
-                const altText = generatedAltTexts.get(image.url)
-                if (altText) {
-                    // Find the node and update its alt text
-                    const node = await framer.getNodeById(image.element_id)
-                    if (node && node.type === "Image") {
-                        await node.setAltText(altText)
-                        appliedCount++
-                    }
+            // With a site URL, skip what the published site already has; images
+            // the server did not find (other pages, unpublished) are still applied
+            const pending = new Map(generatedAltTexts)
+            if (siteUrl) {
+                for (const url of await fetchSkippedUrls()) {
+                    pending.delete(url)
                 }
             }
 
+            const updates = images.filter(image => pending.has(image.url))
+            const nodes = await Promise.all(updates.map(image => framer.getNodeById(image.element_id)))
+
+            await Promise.all(nodes.map(async (node, index) => {
+                if (node && node.type === "Image") {
+                    await node.setAltText(pending.get(updates[index].url))
+                    appliedCount++
+                }
+            }))
+
             setSuccess(`Applied alt text to ${appliedCount} images`)
             
             // Clear the generated texts after applying
@@ -237,6 +344,23 @@ export function AltTextGenerator() {
                         placeholder="Enter your API key"
                     />
                 </div>
+                <div style={{ marginBottom: "10px" }}>
+                    <label style={{ display: "block", marginBottom: "5px", fontSize: "14px" }}>
+                        Published Site URL (optional, applies only changed alt text):
+                    </label>
+                    <input
+                        type="text"
+                        value={siteUrl}
+                        onChange={(e) => setSiteUrl(e.target.value)}
+                        style={{
+                            width: "100%",
+                            padding: "8px",
+                            border: "1px solid #ddd",
+                            borderRadius: "4px"
+                        }}
+                        placeholder="https://your-site.framer.app"
+                    />
+                </div>
                 <button
                     onClick={saveSettings}
                     style={{
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Image URL helpers
+Canonical asset identity and srcset candidate selection for Framer images
+"""
+
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Host serving Framer-managed image assets
+FRAMER_ASSET_HOST = "framerusercontent.com"
+
+# Query parameters that only select a size/encoding variant of the same asset
+SIZING_PARAMS = {
+    "scale-down-to", "width", "height", "w", "h",
+    "lossless", "dpr", "quality", "q", "fit", "format"
+}
+
+# Smallest width in pixels worth sending to the vision model
+MIN_ANALYSIS_WIDTH = 512
+
+# (url, width descriptor, density descriptor)
+SrcsetCandidate = Tuple[str, Optional[int], Optional[float]]
+
+
+def canonical_image_url(url: str) -> str:
+    """
+    Resolve an image URL to a stable asset identity
+
+    Sizing and encoding query parameters are stripped, the remaining ones are
+    sorted and the fragment is dropped, so every variant of the same asset
+    maps to the same string.
+
+    Args:
+        url: Absolute image URL
+
+    Returns:
+        Canonical URL used as the asset ID
+    """
+    if not url or url.startswith("data:"):
+        return url
+
+    parts = urlsplit(url)
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in SIZING_PARAMS
+    )
+    return urlunsplit((
+        parts.scheme.lower(),
+        parts.netloc.lower(),
+        parts.path,
+        urlencode(query),
+        ""
+    ))
+
+
+def is_framer_asset(url: str) -> bool:
+    """Whether an URL points at a Framer-hosted image asset"""
+    host = (urlsplit(url).hostname or "").lower()
+    return host == FRAMER_ASSET_HOST or host.endswith("." + FRAMER_ASSET_HOST)
+
+
+def analysis_image_url(url: str, min_width: int = MIN_ANALYSIS_WIDTH) -> str:
+    """
+    Pick the URL to download for analysis when no srcset is available
+
+    Framer assets are requested scaled down to ``min_width`` so the vision
+    call does not fetch the full-size original. Other URLs are returned as-is.
+    """
+    if not is_framer_asset(url):
+        return url
+    canonical = canonical_image_url(url)
+    separator = "&" if urlsplit(canonical).query else "?"
+    return f"{canonical}{separator}scale-down-to={min_width}"
+
+
+def _srcset_descriptors(srcset: str, position: int) -> Tuple[List[str], int]:
+    """
+    Read the descriptors following a srcset URL, up to the comma ending the candidate
+
+    Commas inside parentheses do not end the candidate, as in the HTML spec.
+
+    Returns:
+        (descriptor tokens, position after the candidate)
+    """
+    descriptors, token, in_parens = [], "", False
+    while position < len(srcset):
+        char = srcset[position]
+        position += 1
+        if in_parens:
+            token += char
+            in_parens = char != ")"
+        elif char == ",":
+            break
+        elif char.isspace():
+            if token:
+                descriptors.append(token)
+                token = ""
+        else:
+            token += char
+            in_parens = char == "("
+    if token:
+        descriptors.append(token)
+    return descriptors, position
+
+
+def parse_srcset(srcset: str) -> List[SrcsetCandidate]:
+    """
+    Parse a srcset attribute value
+
+    Follows the HTML spec tokenisation: a candidate URL is a run of
+    non-whitespace characters without its trailing commas, so URLs that
+    contain commas (Cloudinary transformations, data: URIs) stay intact.
+
+    Args:
+        srcset: Value such as "a.jpg 512w, b.jpg 1024w" or "a.jpg 1x, b.jpg 2x"
+
+    Returns:
+        List of (url, width, density) candidates
+    """
+    candidates = []
+    position = 0
+    while position < len(srcset):
+        # Skip whitespace and separating commas
+        while position < len(srcset) and (srcset[position].isspace() or srcset[position] == ","):
+            position += 1
+        if position >= len(srcset):
+            break
+
+        start = position
+        while position < len(srcset) and not srcset[position].isspace():
+            position += 1
+        url = srcset[start:position]
+
+        descriptors: List[str] = []
+        if url.endswith(","):
+            # A URL followed directly by a comma has no descriptors
+            url = url.rstrip(",")
+        else:
+            descriptors, position = _srcset_descriptors(srcset, position)
+        if not url:
+            continue
+
+        width, density = None, None
+        for descriptor in descriptors:
+            try:
+                if descriptor.endswith("w"):
+                    width = int(descriptor[:-1])
+                elif descriptor.endswith("x"):
+                    density = float(descriptor[:-1])
+            except ValueError:
+                continue
+        candidates.append((url, width, density))
+    return candidates
+
+
+def choose_analysis_candidate(src: str, candidates: List[SrcsetCandidate],
+                              min_width: int = MIN_ANALYSIS_WIDTH) -> str:
+    """
+    Choose the smallest candidate that is still adequate for analysis
+
+    Prefers the narrowest candidate at least ``min_width`` wide, then the
+    widest smaller one, then the 1x density candidate, and finally ``src``.
+    """
+    sized = [(width, url) for url, width, _ in candidates if width]
+    if sized:
+        adequate = [item for item in sized if item[0] >= min_width]
+        return min(adequate)[1] if adequate else max(sized)[1]
+
+    for url, _, density in candidates:
+        if density == 1.0:
+            return url
+
+    return analysis_image_url(src, min_width) if src else (candidates[0][0] if candidates else "")
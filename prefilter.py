@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Image pre-filtering
+Cheap checks that mark decorative or non-content images before any vision API call
+"""
+
+import struct
+import logging
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from image_urls import canonical_image_url
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Verdicts
+GENERATE = "generate"
+DECORATIVE = "decorative"  # Needs alt="" rather than a description
+SKIP = "skip"  # Not an image we can or should describe
+PENDING = "pending"  # Small image that is decorative if it turns up on every page
+
+ICON_MAX_SIZE = 32  # Images at most this many pixels on both sides are icons
+TRACKER_MAX_SIZE = 2  # Images this thin on either side are spacers or trackers
+MIN_FILE_BYTES = 256  # Smaller files are tracking pixels or placeholders
+REPEATED_MAX_SIZE = 96  # Small images repeated on every page are site chrome
+REPEATED_MIN_PAGES = 3
+PROBE_BYTES = 65536  # Enough for the dimensions of all supported formats
+# Content types that CDNs send for any file; they say nothing about the asset
+GENERIC_MIME_TYPES = ('application/octet-stream', 'binary/octet-stream', 'application/binary')
+PROBE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (compatible; AltTextBot/1.0)',
+    'Range': f'bytes=0-{PROBE_BYTES - 1}'
+}
+
+
+@dataclass
+class ImageProbe:
+    """What a partial download of an image revealed"""
+    mime: Optional[str] = None
+    size: Optional[int] = None  # Total file size in bytes
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
+def image_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Read width and height from the first bytes of a PNG, GIF, JPEG or WebP file
+
+    Returns:
+        (width, height), or None if the format is unknown or the data too short
+    """
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        return struct.unpack('>II', data[16:24])
+
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        return struct.unpack('<HH', data[6:10])
+
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP' and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b'VP8 ':
+            width, height = struct.unpack('<HH', data[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b'VP8L':
+            bits = int.from_bytes(data[21:25], 'little')
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b'VP8X':
+            return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+        return None
+
+    if data[:2] == b'\xff\xd8':
+        # Walk JPEG segments up to the start-of-frame marker
+        offset = 2
+        while offset + 9 < len(data):
+            if data[offset] != 0xFF:
+                offset += 1
+                continue
+            marker = data[offset + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                offset += 2
+                continue
+            length = struct.unpack('>H', data[offset + 2:offset + 4])[0]
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+                return width, height
+            offset += 2 + length
+        return None
+
+    return None
+
+
+def _probe_headers(probe: ImageProbe, status_code: int, headers):
+    """Fill in type and total size from the response headers of a ranged request"""
+    probe.mime = (headers.get('Content-Type') or '').split(';')[0].strip().lower() or None
+
+    content_range = headers.get('Content-Range', '')
+    if '/' in content_range and not content_range.endswith('/*'):
+        probe.size = int(content_range.rsplit('/', 1)[1])
+    elif status_code == 200 and headers.get('Content-Length'):
+        probe.size = int(headers['Content-Length'])
+
+
+def _probe_dimensions(probe: ImageProbe, data: bytes):
+    """Fill in the dimensions from the first bytes of the file"""
+    dimensions = image_dimensions(data)
+    if dimensions:
+        probe.width, probe.height = dimensions
+
+
+def probe_image(url: str, timeout: float = 10) -> ImageProbe:
+    """
+    Fetch only the first bytes of an image to learn its type, size and dimensions
+
+    Args:
+        url: Image URL
+        timeout: Request timeout in seconds
+
+    Returns:
+        ImageProbe; fields stay None when they could not be determined
+    """
+    import requests
+
+    probe = ImageProbe()
+    try:
+        with span("probe", "http", url=url):
+            response = requests.get(url, stream=True, timeout=timeout, headers=PROBE_HEADERS)
+        with response:
+            response.raise_for_status()
+            _probe_headers(probe, response.status_code, response.headers)
+
+            data = b''
+            for chunk in response.iter_content(chunk_size=8192):
+                data += chunk
+                if len(data) >= PROBE_BYTES:
+                    break
+
+        _probe_dimensions(probe, data)
+    except (requests.RequestException, ValueError) as e:
+        logger.debug(f"Could not probe {url}: {str(e)}")
+    return probe
+
+
+async def probe_image_async(client, url: str, timeout: float = 10) -> ImageProbe:
+    """
+    Async version of probe_image
+
+    Args:
+        client: httpx.AsyncClient
+        url: Image URL
+        timeout: Request timeout in seconds
+
+    Returns:
+        ImageProbe; fields stay None when they could not be determined
+    """
+    import httpx
+
+    probe = ImageProbe()
+    try:
+        async with client.stream('GET', url, headers=PROBE_HEADERS, timeout=timeout,
+                                 follow_redirects=True) as response:
+            response.raise_for_status()
+            _probe_headers(probe, response.status_code, response.headers)
+
+            data = b''
+            async for chunk in response.aiter_bytes(chunk_size=8192):
+                data += chunk
+                if len(data) >= PROBE_BYTES:
+                    break
+
+        _probe_dimensions(probe, data)
+    except (httpx.HTTPError, ValueError) as e:
+        logger.debug(f"Could not probe {url}: {str(e)}")
+    return probe
+
+
+def classify_image(image, probe: Optional[ImageProbe] = None, page_count: int = 1,
+                   total_pages: int = 1) -> Tuple[str, str]:
+    """
+    Decide whether an image needs generated alt text
+
+    Args:
+        image: ImageInfo to classify
+        probe: Result of probe_image, if the image was probed
+        page_count: Number of analyzed pages the image's asset appears on
+        total_pages: Number of analyzed pages
+
+    Returns:
+        (verdict, reason) where verdict is GENERATE, DECORATIVE or SKIP
+    """
+    if image.url.startswith('data:'):
+        return SKIP, "inline data URI"
+    if image.aria_hidden:
+        return DECORATIVE, "aria-hidden"
+    if image.role in ('presentation', 'none'):
+        return DECORATIVE, f"role={image.role}"
+
+    width = probe.width if probe and probe.width else image.width
+    height = probe.height if probe and probe.height else image.height
+
+    svg = False
+    if probe:
+        mime = probe.mime if probe.mime not in GENERIC_MIME_TYPES else None
+        if mime and not mime.startswith('image/'):
+            return SKIP, f"not an image ({mime})"
+        # SVG logos and diagrams are content; only their size can mark them decorative
+        svg = mime == 'image/svg+xml'
+        if not svg and probe.size is not None and probe.size < MIN_FILE_BYTES:
+            return DECORATIVE, f"tiny file ({probe.size} bytes)"
+
+    if width and height:
+        if min(width, height) <= TRACKER_MAX_SIZE:
+            return DECORATIVE, f"spacer or tracker ({width}x{height})"
+        if max(width, height) <= ICON_MAX_SIZE:
+            return DECORATIVE, f"icon ({width}x{height})"
+        if (total_pages >= REPEATED_MIN_PAGES and page_count == total_pages
+                and max(width, height) <= REPEATED_MAX_SIZE):
+            return DECORATIVE, f"small image repeated on every page ({width}x{height})"
+
+    if svg:
+        # The vision API cannot read SVG, so it is left for a human to describe
+        return SKIP, "SVG (not supported by the vision API)"
+    return GENERATE, ""
+
+
+def _group_by_asset(images: List) -> Tuple[Dict[str, List], Dict[str, set], int]:
+    """Group images by asset; returns (images by asset, pages by asset, number of pages)"""
+    by_asset: Dict[str, List] = {}
+    pages_by_asset: Dict[str, set] = {}
+    for image in images:
+        asset_id = image.asset_id or canonical_image_url(image.url)
+        by_asset.setdefault(asset_id, []).append(image)
+        pages_by_asset.setdefault(asset_id, set()).add(image.page)
+    return by_asset, pages_by_asset, len({image.page for image in images})
+
+
+def _assets_to_probe(by_asset: Dict[str, List]) -> List[Tuple[str, str]]:
+    """(asset ID, URL) of the assets the HTML alone does not already rule out"""
+    return [
+        (asset_id, group[0].url) for asset_id, group in by_asset.items()
+        if classify_image(group[0])[0] == GENERATE
+    ]
+
+
+def _classify_assets(by_asset: Dict[str, List], pages_by_asset: Dict[str, set], total_pages: int,
+                     probes: Dict[str, ImageProbe],
+                     page_counts: Optional[Dict[str, int]] = None) -> Dict[str, Tuple[str, str]]:
+    """
+    Classify every asset with its probe result
+
+    With page_counts (pages each asset was seen on so far), assets that would
+    only be decorative once seen on all total_pages get PENDING.
+    """
+    verdicts = {}
+    for asset_id, group in by_asset.items():
+        probe = probes.get(asset_id)
+        page_count = page_counts[asset_id] if page_counts is not None else len(pages_by_asset[asset_id])
+        verdict = classify_image(group[0], probe, page_count, total_pages)
+        if (page_counts is not None and verdict[0] == GENERATE and page_count < total_pages
+                and classify_image(group[0], probe, total_pages, total_pages)[0] == DECORATIVE):
+            verdict = (PENDING, f"small image on {page_count} of {total_pages} pages so far")
+        verdicts[asset_id] = verdict
+    return verdicts
+
+
+def prefilter_images(images: List, probe: bool = True, max_workers: int = 8,
+                     page_counts: Optional[Dict[str, int]] = None,
+                     total_pages: int = 0) -> Dict[str, Tuple[str, str]]:
+    """
+    Classify images before any vision API call
+
+    Each asset is probed at most once; probes run concurrently.
+
+    Args:
+        images: ImageInfo objects without alt text
+        probe: Download the first bytes of each asset for type, size and dimensions
+        max_workers: Number of concurrent probes
+        page_counts: For images that arrive page by page, the number of pages
+            each asset was seen on so far; used with total_pages instead of
+            the pages in ``images``
+        total_pages: Number of pages that will be analyzed in total
+
+    Returns:
+        Dictionary mapping asset IDs to (verdict, reason); with page_counts,
+        small assets not yet seen on every page are PENDING
+    """
+    with span("prefilter", "prefilter", images=len(images)):
+        by_asset, pages_by_asset, batch_pages = _group_by_asset(images)
+        if page_counts is None or not total_pages:
+            page_counts, total_pages = None, batch_pages
+
+        probes: Dict[str, ImageProbe] = {}
+        if probe:
+            to_probe = _assets_to_probe(by_asset)
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                for asset_id, result in zip(
+                    [asset_id for asset_id, _ in to_probe],
+                    executor.map(probe_image, [url for _, url in to_probe])
+                ):
+                    probes[asset_id] = result
+
+        return _classify_assets(by_asset, pages_by_asset, total_pages, probes, page_counts)
+
+
+async def prefilter_images_async(images: List, client, probe: bool = True,
+                                 max_concurrency: int = 32) -> Dict[str, Tuple[str, str]]:
+    """
+    Async version of prefilter_images
+
+    Args:
+        images: ImageInfo objects without alt text
+        client: httpx.AsyncClient used for the probes
+        probe: Download the first bytes of each asset for type, size and dimensions
+        max_concurrency: Number of concurrent probes
+
+    Returns:
+        Dictionary mapping asset IDs to (verdict, reason)
+    """
+    import asyncio
+
+    by_asset, pages_by_asset, total_pages = _group_by_asset(images)
+
+    probes: Dict[str, ImageProbe] = {}
+    if probe:
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def limited_probe(url: str) -> ImageProbe:
+            async with semaphore:
+                return await probe_image_async(client, url)
+
+        to_probe = _assets_to_probe(by_asset)
+        results = await asyncio.gather(*(limited_probe(url) for _, url in to_probe))
+        probes = {asset_id: result for (asset_id, _), result in zip(to_probe, results)}
+
+    return _classify_assets(by_asset, pages_by_asset, total_pages, probes)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Prompt templates for alt text generation
+Versioned, precompiled prompts with a static prefix and structured page context
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional, Union
+
+# Order in which page context is presented to the model
+CONTEXT_FIELDS = [
+    ("page", "Page"),
+    ("heading", "Nearest heading"),
+    ("caption", "Caption"),
+    ("link_text", "Link text"),
+    ("title", "Title attribute"),
+    ("note", "Note"),
+    ("correction", "Correction")
+]
+
+MAX_CONTEXT_VALUE_LENGTH = 300
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """
+    A versioned prompt
+
+    ``instructions`` never changes between calls and is sent first, so the
+    provider's prompt-prefix caching can reuse it; only the image and the
+    rendered context vary per call. Bump ``version`` whenever the wording
+    changes so that cached alt text from the old prompt is not reused.
+    """
+    name: str
+    version: int
+    instructions: str
+
+    @property
+    def key(self) -> str:
+        """Identifier stored with results and used in cache keys"""
+        return f"{self.name}@v{self.version}"
+
+    def render_context(self, context: Union[str, Dict[str, str], None]) -> str:
+        """
+        Render page context as a structured block
+
+        Args:
+            context: Free-form text, or a dictionary with keys from CONTEXT_FIELDS
+
+        Returns:
+            Context block, or an empty string when there is no context
+        """
+        if not context:
+            return ""
+        if isinstance(context, str):
+            context = {"note": context}
+
+        lines = []
+        for key, label in CONTEXT_FIELDS:
+            value = " ".join(str(context.get(key) or "").split())
+            if value:
+                lines.append(f"- {label}: {value[:MAX_CONTEXT_VALUE_LENGTH]}")
+        if not lines:
+            return ""
+        return "Context from the page where the image appears:\n" + "\n".join(lines)
+
+
+DEFAULT_TEMPLATE = PromptTemplate(
+    name="alt-text",
+    version=2,
+    instructions=(
+        "You write alt text for images on websites so that screen reader users "
+        "get the same information as sighted visitors.\n"
+        "Generate concise, descriptive alt text for the image you are given.\n"
+        "The alt text should:\n"
+        "- Be brief but descriptive (under 125 characters)\n"
+        "- Describe what the image shows, not what it looks like\n"
+        "- Include relevant context for screen readers\n"
+        "- Be written in a natural, human-friendly way\n"
+        "Use the page context, when provided, to identify people, products and "
+        "places, but do not repeat it verbatim.\n"
+        "Reply with the alt text only: no quotes, no preamble, and do not start "
+        "with \"Image of\" or \"Picture of\"."
+    )
+)
+
+TEMPLATES: Dict[str, PromptTemplate] = {
+    DEFAULT_TEMPLATE.name: DEFAULT_TEMPLATE
+}
+
+
+def get_template(name: Optional[str] = None) -> PromptTemplate:
+    """
+    Look up a prompt template
+
+    Args:
+        name: Template name; defaults to PROMPT_TEMPLATE or the default template
+
+    Returns:
+        PromptTemplate
+    """
+    name = name or os.environ.get("PROMPT_TEMPLATE") or DEFAULT_TEMPLATE.name
+    if name not in TEMPLATES:
+        raise ValueError(f"Unknown prompt template: {name}")
+    return TEMPLATES[name]
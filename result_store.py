@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Result store
+Indexed SQLite history of generated alt text, shared by the CLI, the scheduler and the API server
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from image_urls import canonical_image_url
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESULT_STORE_PATH = "alt_text_results.db"
+MAX_PAGE_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    site_url TEXT NOT NULL DEFAULT '',
+    page TEXT,
+    image_url TEXT NOT NULL,
+    asset_id TEXT NOT NULL,
+    image_digest TEXT NOT NULL,
+    alt_text TEXT NOT NULL,
+    decorative INTEGER NOT NULL DEFAULT 0,
+    model TEXT,
+    prompt_version TEXT,
+    source TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_site ON results (site_url, id);
+CREATE INDEX IF NOT EXISTS idx_results_site_digest ON results (site_url, image_digest, id);
+CREATE INDEX IF NOT EXISTS idx_results_digest ON results (image_digest, id);
+CREATE INDEX IF NOT EXISTS idx_results_prompt ON results (prompt_version, model, id);
+"""
+
+# Columns that query() can filter on
+FILTER_COLUMNS = ("site_url", "page", "asset_id", "image_digest", "model", "prompt_version", "source")
+
+
+def image_digest(image_url: str) -> str:
+    """Fixed-length key of an image asset; all size variants share the same digest"""
+    return hashlib.sha256(canonical_image_url(image_url).encode()).hexdigest()
+
+
+class ResultStore:
+    """
+    Append-only history of generated alt text
+
+    Every generation is a row keyed by site, page, image digest, model and
+    prompt version. The database runs in WAL mode, so the API server, the CLI
+    and scheduler worker processes can write to the same file while others
+    read. Each thread uses its own connection.
+
+    Queries are paginated with a cursor (the id of the last row returned), so
+    large histories are read page by page without offsets.
+    """
+
+    def __init__(self, path: str = DEFAULT_RESULT_STORE_PATH):
+        """
+        Args:
+            path: SQLite database file, created if missing
+        """
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, site_url: Optional[str], results: List[Dict], model: Optional[str] = None,
+               prompt_version: Optional[str] = None, source: Optional[str] = None) -> int:
+        """
+        Store generated alt text
+
+        Args:
+            site_url: Site the images belong to ('' or None when unknown)
+            results: Dictionaries with "url" and "alt_text" (or "generated_alt_text"),
+                and optionally "page" and "decorative"
+            model: Vision backend that generated the text
+            prompt_version: Key of the prompt template used
+            source: What produced the results ("cli", "api", "scheduler")
+
+        Returns:
+            Number of rows written
+        """
+        now = time.time()
+        rows = []
+        for result in results:
+            url = result.get("url")
+            alt_text = result.get("alt_text", result.get("generated_alt_text"))
+            decorative = bool(result.get("decorative"))
+            # Failed generations are not history worth keeping
+            if not url or (not alt_text and not decorative):
+                continue
+            asset_id = canonical_image_url(url)
+            rows.append((
+                site_url or "", result.get("page"), url, asset_id,
+                hashlib.sha256(asset_id.encode()).hexdigest(), alt_text or "",
+                int(decorative), model, prompt_version, source, now
+            ))
+
+        if not rows:
+            return 0
+
+        conn = self._connect()
+        with span("write", "sqlite", rows=len(rows)), conn:
+            conn.executemany(
+                "INSERT INTO results (site_url, page, image_url, asset_id, image_digest, alt_text, "
+                "decorative, model, prompt_version, source, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    @staticmethod
+    def _page(rows: List[sqlite3.Row], limit: int) -> Tuple[List[Dict], Optional[int]]:
+        """Turn limit + 1 fetched rows into (records, next cursor)"""
+        records = [dict(row) for row in rows[:limit]]
+        for record in records:
+            record["decorative"] = bool(record["decorative"])
+        next_cursor = records[-1]["id"] if len(rows) > limit else None
+        return records, next_cursor
+
+    def query(self, limit: int = 50, cursor: Optional[int] = None, **filters) -> Tuple[List[Dict], Optional[int]]:
+        """
+        List stored results, newest first
+
+        Args:
+            limit: Page size (at most MAX_PAGE_SIZE)
+            cursor: next_cursor of the previous page
+            **filters: Exact-match filters on FILTER_COLUMNS; image_url is
+                matched through its digest
+
+        Returns:
+            (records, next_cursor); next_cursor is None on the last page
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        if filters.get("image_url"):
+            filters["image_digest"] = image_digest(filters.pop("image_url"))
+
+        clauses, params = [], []
+        for column in FILTER_COLUMNS:
+            if filters.get(column) is not None:
+                clauses.append(f"{column} = ?")
+                params.append(filters[column])
+        if cursor is not None:
+            clauses.append("id < ?")
+            params.append(cursor)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT * FROM results {where} ORDER BY id DESC LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+        return self._page(rows, limit)
+
+    def latest_for_site(self, site_url: str, prompt_version: Optional[str] = None, limit: int = 100,
+                        cursor: Optional[int] = None) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Most recent result for each image of a site, newest first
+
+        Args:
+            site_url: Site to load
+            prompt_version: Only consider results of this prompt version
+            limit: Page size (at most MAX_PAGE_SIZE)
+            cursor: next_cursor of the previous page
+
+        Returns:
+            (records, next_cursor); next_cursor is None on the last page
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        inner = "SELECT MAX(id) FROM results WHERE site_url = ?"
+        params: List = [site_url]
+        if prompt_version:
+            inner += " AND prompt_version = ?"
+            params.append(prompt_version)
+        inner += " GROUP BY image_digest"
+
+        outer = ""
+        if cursor is not None:
+            outer = " AND id < ?"
+            params.append(cursor)
+
+        rows = self._connect().execute(
+            f"SELECT * FROM results WHERE id IN ({inner}){outer} ORDER BY id DESC LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+        return self._page(rows, limit)
+
+    def sites(self) -> List[Dict]:
+        """Sites with stored results, with result and image counts"""
+        rows = self._connect().execute(
+            "SELECT site_url, COUNT(*) AS results, COUNT(DISTINCT image_digest) AS images, "
+            "MAX(created_at) AS last_generated FROM results GROUP BY site_url ORDER BY last_generated DESC"
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+
+def result_store_from_env() -> Optional[ResultStore]:
+    """
+    Open the store at RESULT_STORE_PATH (default alt_text_results.db)
+
+    Returns:
+        ResultStore, or None when RESULT_STORE_PATH is set to an empty value
+        or the database cannot be opened
+    """
+    path = os.environ.get("RESULT_STORE_PATH", DEFAULT_RESULT_STORE_PATH)
+    if not path:
+        return None
+    try:
+        return ResultStore(path)
+    except sqlite3.Error as e:
+        logger.warning(f"Result store disabled, could not open {path}: {str(e)}")
+        return None
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Multi-site scan scheduler
+Sweeps many Framer sites across a process pool with a shared global rate limit
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from alt_text_generator import (
+    AltTextGenerator, FramerSiteAnalyzer, PRIORITY_BULK, build_results_output
+)
+from result_store import result_store_from_env
+from tracing import configure_tracing, profiled
+from vision_backends import backend_from_env, backend_requires_openai_key
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SharedRateLimiter:
+    """
+    Rate limiter shared by all worker processes
+
+    Holds the next free API slot in a multiprocessing manager, so the spacing
+    between calls applies across every site being swept. It has the same
+    acquire() interface as PriorityRateLimiter; all scheduler work runs in the
+    bulk lane, so the priority argument is accepted but not used.
+    """
+
+    def __init__(self, min_interval: float, lock, next_slot):
+        """
+        Args:
+            min_interval: Minimum delay in seconds between two API calls
+            lock: Manager lock guarding next_slot
+            next_slot: Manager value holding the time of the next free slot
+        """
+        self.min_interval = min_interval
+        self._lock = lock
+        self._next_slot = next_slot
+
+    def acquire(self, priority: int = PRIORITY_BULK) -> float:
+        """Block until the caller may make an API call; returns seconds waited"""
+        started = time.time()
+        while True:
+            with self._lock:
+                now = time.time()
+                wait = self._next_slot.value - now
+                if wait <= 0:
+                    self._next_slot.value = now + self.min_interval
+                    return now - started
+            time.sleep(wait)
+
+
+def site_slug(site_url: str) -> str:
+    """File-system safe name for a site URL"""
+    return re.sub(r'[^a-zA-Z0-9]+', '-', site_url.split('//')[-1]).strip('-').lower()
+
+
+def load_site_state(state_dir: str, site_url: str) -> Dict:
+    """Load the persistent state of a site, or a fresh one"""
+    path = os.path.join(state_dir, f"{site_slug(site_url)}.json")
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {"site_url": site_url, "runs": 0, "last_run": None, "generated": {}}
+
+
+def save_site_state(state_dir: str, state: Dict):
+    """Write the state of a site atomically"""
+    os.makedirs(state_dir, exist_ok=True)
+    path = os.path.join(state_dir, f"{site_slug(state['site_url'])}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_site(site: Dict, rate_limiter: SharedRateLimiter, state_dir: str, output_dir: str,
+             openai_api_key: Optional[str]) -> Dict:
+    """
+    Scan one site and generate alt text for images not handled in earlier runs
+
+    Runs inside a worker process.
+
+    Args:
+        site: Site settings (site_url, pages, batch_size, concurrency)
+        rate_limiter: Global limiter shared with the other workers
+        state_dir: Directory holding per-site state files
+        output_dir: Directory receiving per-site results files
+        openai_api_key: OpenAI API key
+
+    Returns:
+        Summary of the run
+    """
+    # Each worker process writes its own trace file
+    configure_tracing(per_process=True)
+
+    site_url = site["site_url"]
+    started = time.time()
+    state = load_site_state(state_dir, site_url)
+
+    with profiled(f"site-{site_slug(site_url)}"):
+        analyzer = FramerSiteAnalyzer(site_url)
+        images = analyzer.find_images_without_alt(site.get("pages") or [""])
+
+        # Skip assets that earlier runs already generated alt text for
+        done = state["generated"]
+        images = [image for image in images if not done.get(image.asset_id)]
+
+        generator = AltTextGenerator(
+            openai_api_key,
+            rate_limiter=rate_limiter,
+            backend=backend_from_env(openai_api_key)
+        )
+        results = generator.generate_batch_alt_text(
+            images,
+            batch_size=int(site.get("batch_size", 0)),
+            max_workers=int(site.get("concurrency", 1))
+        )
+
+    output = build_results_output(site_url, images, results, prompt_version=generator.prompt_template.key)
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, f"{site_slug(site_url)}_alt_text_results.json")
+    with open(output_file, 'w') as f:
+        json.dump(output, f, indent=2)
+
+    store = result_store_from_env()
+    if store:
+        store.record(site_url, output["results"], model=generator.backend.name,
+                     prompt_version=generator.prompt_template.key, source="scheduler")
+
+    for result in output["results"]:
+        if result["generated_alt_text"]:
+            done[result["asset_id"]] = result["generated_alt_text"]
+    state["runs"] += 1
+    state["last_run"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    save_site_state(state_dir, state)
+
+    return {
+        "site_url": site_url,
+        "images_pending": len(images),
+        "generated": sum(1 for r in output["results"] if r["generated_alt_text"]),
+        "decorative": sum(1 for r in output["results"] if r["decorative"]),
+        "failed": sum(1 for r in output["results"] if not r["generated_alt_text"] and not r["decorative"]),
+        "output_file": output_file,
+        "seconds": round(time.time() - started, 1)
+    }
+
+
+def load_sites(config_file: str) -> List[Dict]:
+    """
+    Load site settings from a JSON file
+
+    The file holds {"defaults": {...}, "sites": [{"site_url": ...}, ...]}; each
+    site may override pages, batch_size (per-run budget) and concurrency.
+    """
+    with open(config_file, 'r') as f:
+        config = json.load(f)
+
+    defaults = config.get("defaults", {})
+    sites = []
+    for site in config.get("sites", []):
+        if isinstance(site, str):
+            site = {"site_url": site}
+        if not site.get("site_url"):
+            logger.warning(f"Skipping site without site_url: {site}")
+            continue
+        sites.append({**defaults, **site})
+    return sites
+
+
+def main(argv: Optional[List[str]] = None):
+    """Main function to sweep a list of sites"""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Generate alt text for many Framer sites")
+    parser.add_argument("config", help="JSON file listing the sites to sweep")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of sites processed in parallel (default: CPU count)")
+    parser.add_argument("--rate-limit-delay", type=float,
+                        default=float(os.environ.get("RATE_LIMIT_DELAY", "2.0")),
+                        help="Seconds between API calls across all sites")
+    parser.add_argument("--state-dir", default=".alt_text_state",
+                        help="Directory for persistent per-site state")
+    parser.add_argument("--output-dir", default="results",
+                        help="Directory for per-site results files")
+    args = parser.parse_args(argv)
+
+    openai_api_key = os.environ.get("OPENAI_API_KEY", "")
+    if not openai_api_key and backend_requires_openai_key():
+        logger.error("OPENAI_API_KEY environment variable is required")
+        return 1
+
+    sites = load_sites(args.config)
+    if not sites:
+        logger.error(f"No sites found in {args.config}")
+        return 1
+
+    with multiprocessing.Manager() as manager:
+        rate_limiter = SharedRateLimiter(args.rate_limit_delay, manager.Lock(), manager.Value('d', 0.0))
+
+        workers = max(1, min(args.workers, len(sites)))
+        logger.info(f"Sweeping {len(sites)} sites with {workers} worker processes...")
+        summaries = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(run_site, site, rate_limiter, args.state_dir, args.output_dir, openai_api_key): site
+                for site in sites
+            }
+            for future in as_completed(futures):
+                site_url = futures[future]["site_url"]
+                try:
+                    summary = future.result()
+                    logger.info(f"Finished {site_url}: {summary['generated']} generated, "
+                                f"{summary['failed']} failed in {summary['seconds']}s")
+                except Exception as e:
+                    logger.error(f"Failed to process {site_url}: {str(e)}")
+                    summary = {"site_url": site_url, "error": str(e)}
+                summaries.append(summary)
+
+    print(json.dumps(summaries, indent=2))
+    return 0 if all("error" not in summary for summary in summaries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Apply alt text against tests/mock_editor.html with real headless Chrome
+
+Skipped when Selenium or Chrome is not available.
+"""
+
+import json
+import pathlib
+
+import pytest
+
+pytest.importorskip("selenium")
+pytest.importorskip("dotenv")
+
+from apply_alt_text import FramerAltTextApplier
+
+MOCK_EDITOR_URL = (pathlib.Path(__file__).parent / "mock_editor.html").resolve().as_uri()
+
+RESULTS = [
+    {"element_id": "hero-image", "url": "https://framerusercontent.com/images/hero.png",
+     "generated_alt_text": "Team gathered around a whiteboard"},
+    {"element_id": "team-photo", "url": "https://framerusercontent.com/images/team.jpg",
+     "generated_alt_text": "Five people smiling outside the office"},
+    {"element_id": "banner", "url": "https://framerusercontent.com/images/banner.jpg",
+     "generated_alt_text": "City skyline at dusk"},
+    {"element_id": "logo-header", "url": "https://framerusercontent.com/images/logo.png",
+     "generated_alt_text": "Acme logo"},
+]
+
+
+@pytest.fixture
+def results_file(tmp_path):
+    path = tmp_path / "alt_text_results.json"
+    path.write_text(json.dumps({"site_url": "https://example.framer.app", "results": RESULTS}))
+    return str(path)
+
+
+def make_applier(**options):
+    applier = FramerAltTextApplier("test@example.com", "unused", headless=True, explicit_waits=True,
+                                   wait_timeout=5, **options)
+    try:
+        applier.setup_driver()
+    except Exception as e:
+        pytest.skip(f"Chrome is not available: {e}")
+    applier.open_project(MOCK_EDITOR_URL)
+    return applier
+
+
+def applied_alt_text(applier):
+    """Alt text saved in the mock editor of every driver, merged"""
+    applied = {}
+    for driver in [applier.driver] + applier._worker_drivers:
+        applied.update(driver.execute_script("return window.appliedAltText"))
+    return applied
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_apply_with_search(results_file, workers):
+    applier = make_applier()
+    try:
+        assert applier.apply_alt_texts_from_file(results_file, workers=workers) == len(RESULTS)
+        applied = applied_alt_text(applier)
+        for result in RESULTS:
+            assert applied[result["element_id"]] == result["generated_alt_text"]
+    finally:
+        applier.cleanup()
+
+
+def test_apply_with_element_index(results_file):
+    applier = make_applier(use_element_index=True)
+    try:
+        # The logo result also reaches the footer logo, which shows the same asset
+        assert applier.apply_alt_texts_from_file(results_file, workers=2) == len(RESULTS) + 1
+        applied = applied_alt_text(applier)
+        assert applied["hero-image"] == "Team gathered around a whiteboard"
+        assert applied["banner"] == "City skyline at dusk"
+        assert applied["logo-header"] == applied["logo-footer"] == "Acme logo"
+        # Nodes that already have alt text are left alone
+        assert "logo-about" not in applied
+    finally:
+        applier.cleanup()
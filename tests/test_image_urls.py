@@ -0,0 +1,61 @@
+from image_urls import (
+    analysis_image_url, canonical_image_url, choose_analysis_candidate, is_framer_asset, parse_srcset
+)
+
+
+def test_parse_srcset_widths_and_densities():
+    assert parse_srcset("a.jpg 512w, b.jpg 1024w") == [("a.jpg", 512, None), ("b.jpg", 1024, None)]
+    assert parse_srcset("a.jpg 1x,b.jpg 2x") == [("a.jpg", None, 1.0), ("b.jpg", None, 2.0)]
+    assert parse_srcset("a.jpg") == [("a.jpg", None, None)]
+    assert parse_srcset("  ,, ") == []
+
+
+def test_parse_srcset_keeps_commas_inside_urls():
+    srcset = ("https://res.cloudinary.com/demo/image/upload/w_400,c_fill/dog.jpg 400w, "
+              "https://res.cloudinary.com/demo/image/upload/w_800,c_fill/dog.jpg 800w")
+    assert parse_srcset(srcset) == [
+        ("https://res.cloudinary.com/demo/image/upload/w_400,c_fill/dog.jpg", 400, None),
+        ("https://res.cloudinary.com/demo/image/upload/w_800,c_fill/dog.jpg", 800, None),
+    ]
+    assert choose_analysis_candidate("", parse_srcset(srcset)) == \
+        "https://res.cloudinary.com/demo/image/upload/w_800,c_fill/dog.jpg"
+
+
+def test_parse_srcset_data_uri_and_trailing_commas():
+    data_uri = "data:image/png;base64,iVBORw0KGgo="
+    assert parse_srcset(f"{data_uri} 1x, b.jpg 2x") == [(data_uri, None, 1.0), ("b.jpg", None, 2.0)]
+    assert parse_srcset("a.jpg, b.jpg 2x") == [("a.jpg", None, None), ("b.jpg", None, 2.0)]
+    # Without whitespace the comma is part of the URL, as in browsers
+    assert parse_srcset("a.jpg,b.jpg 2x") == [("a.jpg,b.jpg", None, 2.0)]
+
+
+def test_parse_srcset_ignores_invalid_descriptors():
+    assert parse_srcset("a.jpg bogusw, b.jpg 2x") == [("a.jpg", None, None), ("b.jpg", None, 2.0)]
+
+
+def test_choose_analysis_candidate_prefers_smallest_adequate():
+    candidates = parse_srcset("s.jpg 256w, m.jpg 600w, l.jpg 1200w")
+    assert choose_analysis_candidate("src.jpg", candidates) == "m.jpg"
+    assert choose_analysis_candidate("src.jpg", parse_srcset("s.jpg 256w, t.jpg 300w")) == "t.jpg"
+    assert choose_analysis_candidate("src.jpg", parse_srcset("a.jpg 2x, b.jpg 1x")) == "b.jpg"
+
+
+def test_canonical_image_url_merges_size_variants():
+    base = "https://framerusercontent.com/images/abc.png"
+    assert canonical_image_url(f"{base}?scale-down-to=512") == base
+    assert canonical_image_url(f"{base}?width=100&lossless=1#x") == base
+    assert canonical_image_url(f"HTTPS://FramerUserContent.com/images/abc.png?b=2&a=1") == f"{base}?a=1&b=2"
+    assert canonical_image_url("data:image/png;base64,xx") == "data:image/png;base64,xx"
+
+
+def test_is_framer_asset_matches_host_and_subdomains_only():
+    assert is_framer_asset("https://framerusercontent.com/images/a.png")
+    assert is_framer_asset("https://cdn.framerusercontent.com/images/a.png")
+    assert not is_framer_asset("https://evilframerusercontent.com/images/a.png")
+    assert not is_framer_asset("https://framerusercontent.com.evil.net/a.png")
+
+
+def test_analysis_image_url_only_scales_framer_assets():
+    assert analysis_image_url("https://framerusercontent.com/images/a.png?width=2000") == \
+        "https://framerusercontent.com/images/a.png?scale-down-to=512"
+    assert analysis_image_url("https://example.com/a.png?width=2000") == "https://example.com/a.png?width=2000"
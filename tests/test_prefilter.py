@@ -0,0 +1,82 @@
+import struct
+
+from alt_text_generator import ImageInfo
+from prefilter import (
+    DECORATIVE, GENERATE, PENDING, SKIP, ImageProbe, _classify_assets, _group_by_asset, classify_image,
+    image_dimensions, prefilter_images
+)
+
+
+def png_header(width, height):
+    return b'\x89PNG\r\n\x1a\n' + b'\x00\x00\x00\rIHDR' + struct.pack('>II', width, height)
+
+
+def test_image_dimensions_png_and_gif():
+    assert image_dimensions(png_header(640, 480)) == (640, 480)
+    assert image_dimensions(b'GIF89a' + struct.pack('<HH', 1, 1)) == (1, 1)
+
+
+def test_image_dimensions_jpeg_skips_to_start_of_frame():
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00' + b'\x00' * 9
+    sof0 = b'\xff\xc0' + struct.pack('>H', 17) + b'\x08' + struct.pack('>HH', 300, 400) + b'\x03' + b'\x00' * 9
+    assert image_dimensions(b'\xff\xd8' + app0 + sof0) == (400, 300)
+
+
+def test_image_dimensions_webp_variants():
+    vp8x = b'RIFF' + b'\x00' * 4 + b'WEBPVP8X' + b'\x00' * 8 + (99).to_bytes(3, 'little') + (49).to_bytes(3, 'little')
+    assert image_dimensions(vp8x) == (100, 50)
+    vp8 = b'RIFF' + b'\x00' * 4 + b'WEBPVP8 ' + b'\x00' * 10 + struct.pack('<HH', 120, 80)
+    assert image_dimensions(vp8) == (120, 80)
+
+
+def test_image_dimensions_unknown_or_truncated():
+    assert image_dimensions(b'') is None
+    assert image_dimensions(b'<svg xmlns="http://www.w3.org/2000/svg"/>') is None
+    assert image_dimensions(b'\x89PNG\r\n\x1a\n') is None
+
+
+def test_classify_from_markup():
+    assert classify_image(ImageInfo("data:image/png;base64,xx"))[0] == SKIP
+    assert classify_image(ImageInfo("https://x.test/a.png", aria_hidden=True))[0] == DECORATIVE
+    assert classify_image(ImageInfo("https://x.test/a.png", role="presentation"))[0] == DECORATIVE
+    assert classify_image(ImageInfo("https://x.test/a.png", width=16, height=16))[0] == DECORATIVE
+    assert classify_image(ImageInfo("https://x.test/a.png", width=1, height=400))[0] == DECORATIVE
+    assert classify_image(ImageInfo("https://x.test/a.png", width=800, height=600)) == (GENERATE, "")
+
+
+def test_classify_with_probe():
+    image = ImageInfo("https://x.test/a.png")
+    assert classify_image(image, ImageProbe(mime="text/html"))[0] == SKIP
+    assert classify_image(image, ImageProbe(mime="image/png", size=100))[0] == DECORATIVE
+    assert classify_image(image, ImageProbe(mime="image/png", size=5000, width=24, height=24))[0] == DECORATIVE
+    # Generic CDN content types do not rule an image out
+    assert classify_image(image, ImageProbe(mime="application/octet-stream", size=5000,
+                                            width=800, height=600))[0] == GENERATE
+
+
+def test_classify_svg():
+    image = ImageInfo("https://x.test/logo.svg")
+    assert classify_image(image, ImageProbe(mime="image/svg+xml", size=120))[0] == SKIP
+    assert classify_image(ImageInfo("https://x.test/i.svg", width=20, height=20),
+                          ImageProbe(mime="image/svg+xml", size=120))[0] == DECORATIVE
+
+
+def test_small_image_repeated_on_every_page_is_decorative():
+    pages = ["", "about", "pricing"]
+    images = [ImageInfo("https://x.test/logo.png", page=page, width=64, height=64) for page in pages]
+    images.append(ImageInfo("https://x.test/hero.png", page="", width=64, height=64))
+    verdicts = _classify_assets(*_group_by_asset(images), probes={})
+    assert verdicts["https://x.test/logo.png"][0] == DECORATIVE
+    assert verdicts["https://x.test/hero.png"][0] == GENERATE
+
+
+def test_page_counts_span_batches():
+    logo = ImageInfo("https://x.test/logo.png", page="pricing", width=64, height=64)
+    hero = ImageInfo("https://x.test/hero.png", page="pricing", width=800, height=600)
+    counts = {"https://x.test/logo.png": 2, "https://x.test/hero.png": 2}
+    verdicts = prefilter_images([logo, hero], probe=False, page_counts=counts, total_pages=4)
+    assert verdicts["https://x.test/logo.png"][0] == PENDING
+    assert verdicts["https://x.test/hero.png"][0] == GENERATE
+    counts["https://x.test/logo.png"] = 4
+    verdicts = prefilter_images([logo], probe=False, page_counts=counts, total_pages=4)
+    assert verdicts["https://x.test/logo.png"][0] == DECORATIVE
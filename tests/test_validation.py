@@ -0,0 +1,77 @@
+import pytest
+
+import alt_text_generator
+from alt_text_generator import AltTextGenerator
+from validation import (
+    BOILERPLATE, EMPTY, REFUSAL, TOO_LONG, DuplicateTracker, clean_alt_text, validate_alt_text
+)
+from vision_backends import VisionBackend
+
+
+def test_clean_alt_text():
+    assert clean_alt_text('  "A dog\n on a   beach" ') == "A dog on a beach"
+    assert clean_alt_text(None) == ""
+
+
+@pytest.mark.parametrize("text, reason", [
+    ("", EMPTY),
+    ("I'm sorry, I can't help with that.", REFUSAL),
+    ("Please provide an image.", REFUSAL),
+    ("Image of a dog on a beach", BOILERPLATE),
+    ("Alt text: a dog", BOILERPLATE),
+    ("x" * 126, TOO_LONG),
+    ("Golden retriever running along a beach at sunset", None),
+    ("Imagery workshop banner", None),
+])
+def test_validate_alt_text(text, reason):
+    assert validate_alt_text(text) == reason
+
+
+def test_duplicate_tracker():
+    tracker = DuplicateTracker()
+    tracker.add("Team photo!", "a")
+    assert tracker.is_duplicate("team photo", "b")
+    assert not tracker.is_duplicate("team photo", "a")
+    assert not tracker.is_duplicate("Office photo", "b")
+    tracker.add("", "c")
+    assert not tracker.is_duplicate("", "d")
+
+
+class ScriptedBackend(VisionBackend):
+    """Answers from a list; exceptions in the list are raised"""
+
+    name = "scripted"
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.calls = 0
+
+    def describe(self, image_url, instructions, context="", max_tokens=300):
+        self.calls += 1
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def generator(backend):
+    return AltTextGenerator(rate_limit_delay=0, backend=backend)
+
+
+def test_rejected_answers_are_regenerated():
+    backend = ScriptedBackend(["Image of a dog", "", "Dog on a beach"])
+    assert generator(backend).generate_validated_alt_text("https://x.test/dog.png") == "Dog on a beach"
+    assert backend.calls == 3
+
+
+def test_backend_errors_are_not_regenerated():
+    backend = ScriptedBackend([RuntimeError("boom")] * 3)
+    assert generator(backend).generate_validated_alt_text("https://x.test/dog.png") == ""
+    assert backend.calls == 1
+
+
+def test_exhausted_rate_limit_is_not_regenerated(monkeypatch):
+    monkeypatch.setattr(alt_text_generator.time, "sleep", lambda seconds: None)
+    backend = ScriptedBackend([RuntimeError("429 rate_limit_exceeded")] * 9)
+    assert generator(backend).generate_validated_alt_text("https://x.test/dog.png") == ""
+    assert backend.calls == 3
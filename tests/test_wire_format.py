@@ -0,0 +1,52 @@
+import gzip
+import zlib
+
+import pytest
+
+import wire_format
+from wire_format import PayloadTooLarge, choose_format, columnar_payload, decompress, to_columns
+
+
+def test_decompress_plain_and_gzip():
+    assert decompress(b'{"a": 1}', None, 100) == b'{"a": 1}'
+    assert decompress(b'{"a": 1}', "identity", 100) == b'{"a": 1}'
+    assert decompress(gzip.compress(b'{"a": 1}'), "gzip", 100) == b'{"a": 1}'
+    assert decompress(zlib.compress(b'{"a": 1}'), "deflate", 100) == b'{"a": 1}'
+
+
+def test_decompress_stops_at_max_size():
+    bomb = gzip.compress(b"\0" * 10_000_000)
+    assert len(bomb) < 20_000
+    with pytest.raises(PayloadTooLarge):
+        decompress(bomb, "gzip", 1_000_000)
+    with pytest.raises(PayloadTooLarge):
+        decompress(b"x" * 101, None, 100)
+
+
+def test_decompress_refuses_brotli_and_unknown_encodings():
+    with pytest.raises(ValueError):
+        decompress(b"anything", "br", 100)
+    with pytest.raises(ValueError):
+        decompress(b"anything", "compress", 100)
+
+
+def test_decompress_corrupt_body():
+    with pytest.raises(ValueError) as error:
+        decompress(b"not gzip", "gzip", 100)
+    assert not isinstance(error.value, PayloadTooLarge)
+
+
+def test_columnar_payload():
+    records = [{"url": "a", "alt_text": "A"}, {"url": "b"}]
+    assert to_columns(records) == {"url": ["a", "b"], "alt_text": ["A", None]}
+    payload = {"results": records, "skip_urls": ["a"], "total": 2}
+    assert columnar_payload(payload) == {"results": to_columns(records), "skip_urls": ["a"], "total": 2}
+    assert payload["results"] is records
+
+
+def test_choose_format(monkeypatch):
+    assert choose_format(None) == wire_format.FORMAT_JSON
+    assert choose_format("Columns") == wire_format.FORMAT_COLUMNS
+    monkeypatch.setattr(wire_format, "msgpack", None)
+    assert choose_format("msgpack") == wire_format.FORMAT_COLUMNS
+    assert choose_format(None, "application/msgpack") == wire_format.FORMAT_COLUMNS
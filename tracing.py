@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Opt-in tracing and profiling
+Chrome trace-event spans (chrome://tracing, Perfetto, speedscope) and cProfile dumps
+"""
+
+import os
+import re
+import json
+import time
+import atexit
+import logging
+import cProfile
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_tracer = None
+_profile_dir: Optional[str] = None
+_null_span = nullcontext()
+
+
+class Tracer:
+    """
+    Writes complete-duration ("X") trace events to a file as they happen
+
+    The file uses the JSON array trace format, which viewers load even
+    without the closing bracket, so a trace can be opened while the process
+    is still running or after it was killed.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Trace file to create
+        """
+        self.path = path
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._named_threads = set()
+        self._file = open(path, "w")
+        self._file.write("[")
+        self._separator = "\n"
+        self._write({"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0,
+                     "args": {"name": "alt-text"}})
+
+    def _write(self, event: Dict):
+        self._file.write(self._separator + json.dumps(event, default=str))
+        self._file.flush()
+        self._separator = ",\n"
+
+    def complete(self, name: str, category: str, start: float, end: float, args: Dict):
+        """Record a span that ran from start to end (time.perf_counter() values)"""
+        thread = threading.current_thread()
+        with self._lock:
+            if self._file.closed:
+                return
+            if thread.ident not in self._named_threads:
+                self._named_threads.add(thread.ident)
+                self._write({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": thread.ident,
+                             "args": {"name": thread.name}})
+            self._write({
+                "name": name, "cat": category, "ph": "X",
+                "ts": round(start * 1e6, 1), "dur": round((end - start) * 1e6, 1),
+                "pid": self.pid, "tid": thread.ident, "args": args
+            })
+
+    def close(self):
+        """Terminate the event array"""
+        with self._lock:
+            if not self._file.closed:
+                self._file.write("\n]\n")
+                self._file.close()
+
+
+class _Span:
+    """Context manager timing one span"""
+
+    __slots__ = ("tracer", "name", "category", "args", "start")
+
+    def __init__(self, tracer: Tracer, name: str, category: str, args: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.complete(self.name, self.category, self.start, time.perf_counter(), self.args)
+
+
+def span(name: str, category: str = "app", **args):
+    """
+    Time a block of code as a trace span
+
+    A shared no-op context manager is returned while tracing is disabled, so
+    spans cost next to nothing in normal runs.
+
+    Args:
+        name: Span name (fetch, parse, prefilter, cache_lookup, rate_limit_wait, api_call, write, ...)
+        category: Trace category
+        **args: Values shown with the span in the trace viewer
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _null_span
+    return _Span(tracer, name, category, args)
+
+
+def tracing_enabled() -> bool:
+    """Whether spans are being recorded"""
+    return _tracer is not None
+
+
+def configure_tracing(trace_path: Optional[str] = None, profile_dir: Optional[str] = None,
+                      per_process: bool = False):
+    """
+    Enable tracing and profiling from arguments or the environment
+
+    Args:
+        trace_path: Trace file; defaults to ALT_TEXT_TRACE. In a directory or
+            with "{pid}" in the name, one file per process is written
+        profile_dir: Directory for cProfile dumps; defaults to ALT_TEXT_PROFILE_DIR
+        per_process: Always write one trace file per process (worker pools)
+    """
+    global _tracer, _profile_dir
+
+    if _tracer is not None and _tracer.pid != os.getpid():
+        # Inherited through fork; the file belongs to the parent process
+        _tracer = None
+
+    trace_path = trace_path or os.environ.get("ALT_TEXT_TRACE")
+    if trace_path and _tracer is None:
+        if os.path.isdir(trace_path):
+            trace_path = os.path.join(trace_path, "alt-text-{pid}.trace.json")
+        elif per_process and "{pid}" not in trace_path:
+            suffix = ".trace.json" if trace_path.endswith(".trace.json") else os.path.splitext(trace_path)[1]
+            trace_path = f"{trace_path[:len(trace_path) - len(suffix)]}-{{pid}}{suffix}"
+        trace_path = trace_path.replace("{pid}", str(os.getpid()))
+        _tracer = Tracer(trace_path)
+        atexit.register(_tracer.close)
+        logger.info(f"Tracing to {trace_path} (open in chrome://tracing or ui.perfetto.dev)")
+
+    profile_dir = profile_dir or os.environ.get("ALT_TEXT_PROFILE_DIR")
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+        _profile_dir = profile_dir
+
+
+def start_profile() -> Optional[cProfile.Profile]:
+    """
+    Start a cProfile profiler if profiling is enabled
+
+    Returns:
+        Running profiler, or None when profiling is off or another profiler
+        is already active (Python 3.12+ allows only one at a time)
+    """
+    if not _profile_dir:
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None
+    return profiler
+
+
+def stop_profile(profiler: Optional[cProfile.Profile], name: str) -> Optional[str]:
+    """
+    Stop a profiler and dump its stats for snakeviz, pstats or flameprof
+
+    Args:
+        profiler: Result of start_profile
+        name: Label included in the file name (e.g. the request path)
+
+    Returns:
+        Path of the .prof file, or None
+    """
+    if profiler is None:
+        return None
+    profiler.disable()
+    label = re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_") or "run"
+    path = os.path.join(_profile_dir, f"{label}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{threading.get_ident()}.prof")
+    profiler.dump_stats(path)
+    return path
+
+
+@contextmanager
+def profiled(name: str):
+    """Profile a block of code with cProfile when profiling is enabled"""
+    profiler = start_profile()
+    try:
+        yield
+    finally:
+        path = stop_profile(profiler, name)
+        if path:
+            logger.info(f"Profile written to {path}")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Alt text validation
+Checks generated alt text and builds correction hints for regeneration
+"""
+
+import re
+from typing import Dict, Optional
+
+MAX_ALT_TEXT_LENGTH = 125
+
+# Rejection reasons
+EMPTY = "empty"
+TOO_LONG = "too_long"
+REFUSAL = "refusal"
+BOILERPLATE = "boilerplate"
+DUPLICATE = "duplicate"
+
+REFUSAL_PATTERN = re.compile(
+    r"^(i'?m (sorry|unable|not able)|i am (sorry|unable|not able)|i (can(no|')t|cannot)|sorry\b|"
+    r"please (provide|upload|share|note)|as an ai\b|unfortunately\b|sure[!,.]|"
+    r"there (is|appears to be) no image)",
+    re.IGNORECASE
+)
+
+BOILERPLATE_PATTERN = re.compile(
+    r"^((an? )?(image|picture|photo|photograph|graphic) (of|showing|depicting)\b|alt text\b)",
+    re.IGNORECASE
+)
+
+
+def clean_alt_text(text: str) -> str:
+    """Strip whitespace and wrapping quotes from a model answer"""
+    text = " ".join((text or "").split())
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+        text = text[1:-1].strip()
+    return text
+
+
+def validate_alt_text(text: str) -> Optional[str]:
+    """
+    Check alt text for problems that make it unusable
+
+    Args:
+        text: Cleaned alt text
+
+    Returns:
+        Rejection reason (EMPTY, TOO_LONG, REFUSAL or BOILERPLATE), or None if valid
+    """
+    if not text:
+        return EMPTY
+    if REFUSAL_PATTERN.match(text):
+        return REFUSAL
+    if BOILERPLATE_PATTERN.match(text):
+        return BOILERPLATE
+    if len(text) > MAX_ALT_TEXT_LENGTH:
+        return TOO_LONG
+    return None
+
+
+def correction_hint(reason: str, text: str) -> str:
+    """Instruction added to the prompt when regenerating rejected alt text"""
+    if reason == EMPTY:
+        return "The previous attempt returned nothing. Describe what is visible in the image."
+    if reason == TOO_LONG:
+        return (f"The previous answer was {len(text)} characters long. "
+                f"Keep the alt text under {MAX_ALT_TEXT_LENGTH} characters.")
+    if reason == REFUSAL:
+        return ("The previous answer was a refusal or a request for more information. "
+                "Describe what is visible in the image, even if only in general terms.")
+    if reason == BOILERPLATE:
+        return "Do not start with phrases like \"Image of\" or \"Alt text:\"; describe the content directly."
+    if reason == DUPLICATE:
+        return (f"The previous answer \"{text}\" is already used for a different image on this site. "
+                "Mention what distinguishes this image.")
+    return ""
+
+
+class DuplicateTracker:
+    """Detects identical alt text used for different images"""
+
+    def __init__(self):
+        self._owners: Dict[str, str] = {}
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return re.sub(r"[^a-z0-9 ]", "", text.lower()).strip()
+
+    def is_duplicate(self, text: str, asset_id: str) -> bool:
+        """Whether the text is already used for another asset"""
+        owner = self._owners.get(self._normalize(text))
+        return owner is not None and owner != asset_id
+
+    def add(self, text: str, asset_id: str):
+        """Record accepted alt text for an asset"""
+        if text:
+            self._owners.setdefault(self._normalize(text), asset_id)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Vision backends for alt text generation
+OpenAI, OpenAI-compatible endpoints, a local CPU captioning model and a fallback chain
+"""
+
+import os
+import io
+import re
+import logging
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OPENAI_MODEL = "gpt-4o-mini"
+DEFAULT_LOCAL_MODEL = "Salesforce/blip-image-captioning-base"
+
+# Lead-in that captioning models often prepend ("a picture of a dog")
+CAPTION_LEAD_IN = re.compile(
+    r"^(there is |this is )?(an? )?(close up |black and white )?"
+    r"(image|picture|photo|photograph|graphic) (of|showing|depicting|with)\s+",
+    re.IGNORECASE
+)
+
+
+def _chat_messages(instructions: str, context: str, image_url: str, detail: str) -> List[Dict]:
+    """Chat completion messages for one image, shared by the sync and async OpenAI backends"""
+    # The static instructions go first so the provider can cache the prefix
+    content = [{"type": "text", "text": context}] if context else []
+    content.append({
+        "type": "image_url",
+        "image_url": {
+            "url": image_url,
+            "detail": detail
+        }
+    })
+    return [
+        {"role": "system", "content": instructions},
+        {"role": "user", "content": content}
+    ]
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Whether an exception raised by a backend means the backend is rate limited"""
+    message = str(error)
+    return "rate_limit_exceeded" in message or "429" in message
+
+
+class VisionBackend:
+    """Interface for services that describe an image from a prompt"""
+
+    name = "vision"
+    # Whether answers change with the instructions and context; correction
+    # hints are pointless for backends that ignore them
+    follows_instructions = True
+
+    def describe(self, image_url: str, instructions: str, context: str = "", max_tokens: int = 300) -> str:
+        """
+        Describe an image
+
+        Args:
+            image_url: URL of the image
+            instructions: Static instructions, identical for every call
+            context: Per-image context block (may be empty)
+            max_tokens: Upper bound on the length of the answer
+
+        Returns:
+            Generated description
+
+        Raises:
+            Exception: Backend errors; rate limits are detectable with is_rate_limit_error
+        """
+        raise NotImplementedError
+
+
+class OpenAIBackend(VisionBackend):
+    """OpenAI chat completions with image input, or any OpenAI-compatible server"""
+
+    def __init__(self, api_key: Optional[str], model: str = DEFAULT_OPENAI_MODEL,
+                 base_url: Optional[str] = None, detail: str = "auto"):
+        """
+        Args:
+            api_key: API key (local OpenAI-compatible servers usually accept any value)
+            model: Model name to request
+            base_url: Endpoint of an OpenAI-compatible server; None for api.openai.com
+            detail: Image detail level passed with the image
+        """
+        from openai import OpenAI
+
+        self.client = OpenAI(api_key=api_key or "not-needed", base_url=base_url)
+        self.model = model
+        self.detail = detail
+        self.name = f"openai:{model}" if base_url is None else f"openai-compatible:{model}"
+
+    def describe(self, image_url: str, instructions: str, context: str = "", max_tokens: int = 300) -> str:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=_chat_messages(instructions, context, image_url, self.detail),
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content.strip()
+
+
+class AsyncOpenAIBackend(VisionBackend):
+    """
+    Async version of OpenAIBackend for use in an event loop
+
+    ``describe`` is a coroutine. Requests go through one shared httpx
+    connection pool, so many concurrent calls do not need a thread each.
+    """
+
+    def __init__(self, api_key: Optional[str], model: str = DEFAULT_OPENAI_MODEL,
+                 base_url: Optional[str] = None, detail: str = "auto", max_connections: int = 100,
+                 http_client=None):
+        """
+        Args:
+            api_key: API key (local OpenAI-compatible servers usually accept any value)
+            model: Model name to request
+            base_url: Endpoint of an OpenAI-compatible server; None for api.openai.com
+            detail: Image detail level passed with the image
+            max_connections: Size of the connection pool when no http_client is given
+            http_client: httpx.AsyncClient to send requests with
+        """
+        import httpx
+        from openai import AsyncOpenAI
+
+        http_client = http_client or httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(60.0, connect=10.0)
+        )
+        self.client = AsyncOpenAI(api_key=api_key or "not-needed", base_url=base_url, http_client=http_client)
+        self.model = model
+        self.detail = detail
+        self.name = f"openai:{model}" if base_url is None else f"openai-compatible:{model}"
+
+    async def describe(self, image_url: str, instructions: str, context: str = "", max_tokens: int = 300) -> str:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=_chat_messages(instructions, context, image_url, self.detail),
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content.strip()
+
+    async def aclose(self):
+        """Close the connection pool"""
+        await self.client.close()
+
+
+class LocalCaptionBackend(VisionBackend):
+    """
+    CPU-only image captioning with a Hugging Face model
+
+    Needs the optional ``transformers``, ``torch`` and ``pillow`` packages.
+    The model is loaded on first use and shared by all threads; instructions
+    and context are not used since captioning models take no prompt, so the
+    same image always gets the same caption and regenerating it is pointless.
+    """
+
+    follows_instructions = False
+
+    def __init__(self, model_name: str = DEFAULT_LOCAL_MODEL, max_image_size: int = 512):
+        """
+        Args:
+            model_name: Hugging Face image-to-text model
+            max_image_size: Images are downscaled to fit this size before captioning
+        """
+        self.model_name = model_name
+        self.max_image_size = max_image_size
+        self.name = f"local:{model_name}"
+        self._pipeline = None
+        self._lock = threading.Lock()
+
+    def _get_pipeline(self):
+        """Load the captioning pipeline once"""
+        with self._lock:
+            if self._pipeline is None:
+                from transformers import pipeline
+
+                logger.info(f"Loading local captioning model {self.model_name} (CPU)")
+                self._pipeline = pipeline("image-to-text", model=self.model_name, device=-1)
+            return self._pipeline
+
+    def describe(self, image_url: str, instructions: str, context: str = "", max_tokens: int = 300) -> str:
+        import requests
+        from PIL import Image
+
+        response = requests.get(image_url, timeout=30, headers={
+            'User-Agent': 'Mozilla/5.0 (compatible; AltTextBot/1.0)'
+        })
+        response.raise_for_status()
+        image = Image.open(io.BytesIO(response.content)).convert("RGB")
+        image.thumbnail((self.max_image_size, self.max_image_size))
+
+        pipeline = self._get_pipeline()
+        with self._lock:
+            output = pipeline(image, max_new_tokens=min(max_tokens, 60))
+        caption = output[0]["generated_text"].strip()
+        caption = CAPTION_LEAD_IN.sub("", caption) or caption
+        return caption[:1].upper() + caption[1:]
+
+
+class FallbackBackend(VisionBackend):
+    """Tries backends in order, moving to the next one when a backend is rate limited"""
+
+    def __init__(self, backends: List[VisionBackend]):
+        """
+        Args:
+            backends: Backends in order of preference
+        """
+        if not backends:
+            raise ValueError("FallbackBackend needs at least one backend")
+        self.backends = backends
+        self.name = " -> ".join(backend.name for backend in backends)
+        self.follows_instructions = any(backend.follows_instructions for backend in backends)
+
+    def describe(self, image_url: str, instructions: str, context: str = "", max_tokens: int = 300) -> str:
+        last_error = None
+        for backend in self.backends:
+            try:
+                return backend.describe(image_url, instructions, context, max_tokens)
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                last_error = e
+                logger.warning(f"Backend {backend.name} is rate limited, falling back")
+        raise last_error
+
+
+def create_backend(kind: str, api_key: Optional[str] = None, model: Optional[str] = None,
+                   base_url: Optional[str] = None) -> VisionBackend:
+    """
+    Create a backend by kind
+
+    Args:
+        kind: "openai", "openai-compatible" or "local"
+        api_key: API key for OpenAI-style backends
+        model: Model name (backend default when empty)
+        base_url: Endpoint for "openai-compatible"
+
+    Returns:
+        VisionBackend instance
+    """
+    kind = kind.strip().lower()
+    if kind == "openai":
+        return OpenAIBackend(api_key, model or DEFAULT_OPENAI_MODEL)
+    if kind == "openai-compatible":
+        if not base_url:
+            raise ValueError("VISION_BASE_URL is required for the openai-compatible backend")
+        return OpenAIBackend(api_key, model or DEFAULT_OPENAI_MODEL, base_url=base_url)
+    if kind == "local":
+        return LocalCaptionBackend(model or DEFAULT_LOCAL_MODEL)
+    raise ValueError(f"Unknown vision backend: {kind}")
+
+
+def backend_from_env(openai_api_key: Optional[str] = None) -> VisionBackend:
+    """
+    Build the backend (and fallback chain) configured in the environment
+
+    Reads VISION_BACKEND (default "openai"), VISION_MODEL, VISION_BASE_URL,
+    VISION_API_KEY and VISION_FALLBACK (comma-separated backend kinds tried
+    when the primary backend is rate limited).
+    """
+    kind = os.environ.get("VISION_BACKEND", "openai")
+    base_url = os.environ.get("VISION_BASE_URL") or None
+    api_key = os.environ.get("VISION_API_KEY") or openai_api_key
+    primary = create_backend(kind, api_key, os.environ.get("VISION_MODEL") or None, base_url)
+
+    fallback_kinds = [k for k in os.environ.get("VISION_FALLBACK", "").split(",") if k.strip()]
+    if not fallback_kinds:
+        return primary
+
+    # Fallback backends use their own defaults so a local model name is not sent to OpenAI
+    fallbacks = [
+        create_backend(k, openai_api_key if k.strip().lower() == "openai" else api_key, base_url=base_url)
+        for k in fallback_kinds
+    ]
+    return FallbackBackend([primary] + fallbacks)
+
+
+def async_backend_from_env(openai_api_key: Optional[str] = None) -> VisionBackend:
+    """
+    Build the backend configured in the environment for AsyncAltTextGenerator
+
+    OpenAI and OpenAI-compatible backends without a fallback chain get an
+    AsyncOpenAIBackend. Anything else returns the blocking backend from
+    backend_from_env, which the async generator runs in worker threads.
+    """
+    kind = os.environ.get("VISION_BACKEND", "openai").strip().lower()
+    base_url = os.environ.get("VISION_BASE_URL") or None
+    if kind in ("openai", "openai-compatible") and not os.environ.get("VISION_FALLBACK", "").strip():
+        if kind == "openai-compatible" and not base_url:
+            raise ValueError("VISION_BASE_URL is required for the openai-compatible backend")
+        return AsyncOpenAIBackend(
+            os.environ.get("VISION_API_KEY") or openai_api_key,
+            os.environ.get("VISION_MODEL") or DEFAULT_OPENAI_MODEL,
+            base_url=base_url if kind == "openai-compatible" else None
+        )
+    return backend_from_env(openai_api_key)
+
+
+def backend_requires_openai_key() -> bool:
+    """Whether the configured primary backend is the hosted OpenAI API"""
+    return os.environ.get("VISION_BACKEND", "openai").strip().lower() == "openai"
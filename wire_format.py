@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Wire format helpers for the API server
+Body compression (gzip, brotli) and compact columnar / msgpack encodings
+"""
+
+import zlib
+import gzip
+from typing import Dict, List, Optional
+
+try:
+    import brotli  # Optional: brotli content encoding
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack  # Optional: msgpack response format
+except ImportError:
+    msgpack = None
+
+# Responses smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+
+# Compression levels favour speed; these bodies are repetitive JSON
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Response formats
+FORMAT_JSON = "json"
+FORMAT_COLUMNS = "columns"  # JSON with record arrays turned into columns
+FORMAT_MSGPACK = "msgpack"  # Columnar, msgpack encoded
+
+# Payload fields holding lists of records that are sent as columns
+RECORD_FIELDS = ("images_without_alt", "results", "changes")
+
+
+class PayloadTooLarge(ValueError):
+    """A decompressed request body exceeds the allowed size"""
+
+
+def supported_encodings() -> List[str]:
+    """Content encodings this server can produce, best first"""
+    return ["br", "gzip"] if brotli else ["gzip"]
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress a body with "br" or "gzip" """
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def decompress(data: bytes, encoding: Optional[str], max_size: int) -> bytes:
+    """
+    Decompress a request body
+
+    Only gzip and deflate are accepted. Their decoder stops at max_size, while
+    a brotli body of a few KB could expand to gigabytes before any size check,
+    so br request bodies are refused (br is still used for responses).
+
+    Args:
+        data: Raw body
+        encoding: Value of the Content-Encoding header (None or "identity" for plain bodies)
+        max_size: Maximum decompressed size in bytes
+
+    Returns:
+        Decompressed body
+
+    Raises:
+        PayloadTooLarge: The body would decompress to more than max_size bytes
+        ValueError: Unknown encoding or corrupt data
+    """
+    encoding = (encoding or "identity").strip().lower()
+    if encoding == "identity":
+        body = data
+    elif encoding in ("gzip", "x-gzip", "deflate"):
+        # wbits 47 detects gzip and zlib headers
+        decompressor = zlib.decompressobj(47)
+        try:
+            body = decompressor.decompress(data, max_size + 1)
+        except zlib.error as e:
+            raise ValueError(f"Invalid {encoding} body: {str(e)}")
+    else:
+        raise ValueError(f"Unsupported content encoding: {encoding}")
+
+    if len(body) > max_size:
+        raise PayloadTooLarge(f"Request body exceeds {max_size} bytes")
+    return body
+
+
+def to_columns(records: List[Dict]) -> Dict[str, List]:
+    """
+    Turn a list of records into one list per field
+
+    Fields missing from a record become None, so all columns have the same length.
+    """
+    keys: List[str] = []
+    for record in records:
+        for key in record:
+            if key not in keys:
+                keys.append(key)
+    return {key: [record.get(key) for record in records] for key in keys}
+
+
+def columnar_payload(payload: Dict) -> Dict:
+    """Copy of a response payload with its record lists (RECORD_FIELDS) as columns"""
+    compact = dict(payload)
+    for key in RECORD_FIELDS:
+        value = compact.get(key)
+        if isinstance(value, list) and all(isinstance(record, dict) for record in value):
+            compact[key] = to_columns(value)
+    return compact
+
+
+def choose_format(requested: Optional[str], accept: str = "") -> str:
+    """
+    Pick the response format
+
+    Args:
+        requested: Value of the ``format`` query parameter
+        accept: Accept header
+
+    Returns:
+        FORMAT_JSON, FORMAT_COLUMNS or FORMAT_MSGPACK; msgpack falls back to
+        columns when the msgpack package is not installed
+    """
+    requested = (requested or "").strip().lower()
+    if not requested and "application/msgpack" in accept:
+        requested = FORMAT_MSGPACK
+    if requested == FORMAT_MSGPACK:
+        return FORMAT_MSGPACK if msgpack else FORMAT_COLUMNS
+    if requested == FORMAT_COLUMNS:
+        return FORMAT_COLUMNS
+    return FORMAT_JSON
+
+
+def pack(payload: Dict) -> bytes:
+    """Encode a payload as msgpack"""
+    return msgpack.packb(payload, use_bin_type=True)